@@ -1,20 +1,43 @@
+import time
+_INICIO_PROCESSO = time.perf_counter() # Referência para o relatório de tempos de inicialização
+
 import tkinter as tk
 from tkinter import ttk, messagebox
 import sqlite3
 import os
-from datetime import datetime
+import sys
+import threading
+import queue
+import re
+import unicodedata
+import zlib
+import heapq
+from array import array
+from collections import OrderedDict, namedtuple
+from datetime import date, datetime, timedelta
+from functools import lru_cache
 
 # Constantes
 DB_FILE = "agenda_medica.db"
+CACHED_STATEMENTS = 256 # Instruções preparadas mantidas em cache por conexão
+LIMITE_INVALIDACAO_LOTE = 100 # Acima disso, um lote de consultas limpa o cache de agendas inteiro
+# PRAGMA user_version: migrações de dados já aplicadas ao banco (ver migrar_bd)
+# 1: observações movidas de consulta.observacoes para consulta_observacao
+VERSAO_ESQUEMA = 1
 
 #############################################
 # MÓDULO DE GERENCIAMENTO DO BANCO DE DADOS #
 #############################################
 
-def conectar_bd():
-    """Conecta ao banco de dados SQLite."""
+def conectar_bd(db_file=None, check_same_thread=True):
+    """Conecta ao banco de dados SQLite (por padrão, DB_FILE).
+
+    Use check_same_thread=False quando a conexão for aberta em uma thread
+    e entregue a outra (ver App.iniciar_bd_em_segundo_plano).
+    """
     try:
-        conn = sqlite3.connect(DB_FILE)
+        conn = sqlite3.connect(db_file or DB_FILE, cached_statements=CACHED_STATEMENTS,
+                               check_same_thread=check_same_thread)
         conn.row_factory = sqlite3.Row # Retorna linhas como dicionários
         conn.execute("PRAGMA foreign_keys = ON") # Habilita chaves estrangeiras
         return conn
@@ -22,6 +45,53 @@ def conectar_bd():
         print(f"Erro ao conectar ao banco de dados: {e}")
         return None
 
+def uri_somente_leitura(db_file=None):
+    """URI para abrir o banco só para leitura (sqlite3.connect(..., uri=True) ou ATTACH).
+
+    O caminho é convertido por pathlib, que escapa "?", "#" e "%" e trata os
+    caminhos com letra de unidade do Windows.
+    """
+    import pathlib # Só as ferramentas de linha de comando usam; fora da abertura da interface
+    return pathlib.Path(db_file or DB_FILE).resolve().as_uri() + "?mode=ro"
+
+# Observações ficam fora da tabela consulta, compactadas com zlib, para que as
+# listagens não carreguem textos longos; são lidas só ao selecionar a consulta.
+SQL_CRIAR_CONSULTA_OBSERVACAO = """
+        CREATE TABLE IF NOT EXISTS consulta_observacao (
+            id_consulta INTEGER PRIMARY KEY,
+            dados BLOB NOT NULL, -- Texto UTF-8 compactado com zlib
+            FOREIGN KEY (id_consulta) REFERENCES consulta (id_consulta) ON DELETE CASCADE
+        );
+        """
+
+# Pedidos de pacientes aguardando um horário com um médico ou com qualquer
+# médico de uma especialidade (ver ListaEspera)
+SQL_CRIAR_LISTA_ESPERA = """
+        CREATE TABLE IF NOT EXISTS lista_espera (
+            id_espera INTEGER PRIMARY KEY AUTOINCREMENT,
+            id_paciente INTEGER NOT NULL,
+            id_medico INTEGER, -- NULL: qualquer médico da especialidade
+            especialidade TEXT,
+            prioridade INTEGER NOT NULL DEFAULT 3, -- 1 = mais urgente
+            data_pedido TEXT NOT NULL, -- YYYY-MM-DD HH:MM:SS
+            situacao TEXT NOT NULL DEFAULT 'aguardando', -- 'aguardando', 'agendado' ou 'cancelado'
+            id_consulta INTEGER, -- Consulta marcada quando o pedido foi atendido
+            FOREIGN KEY (id_paciente) REFERENCES paciente (id_paciente) ON DELETE CASCADE,
+            FOREIGN KEY (id_medico) REFERENCES medico (id_medico) ON DELETE CASCADE
+        );
+        """
+
+# Horários preferidos de cada pedido da lista de espera (usados por agendamento_lote.py)
+SQL_CRIAR_LISTA_ESPERA_JANELA = """
+        CREATE TABLE IF NOT EXISTS lista_espera_janela (
+            id_espera INTEGER NOT NULL,
+            inicio TEXT NOT NULL, -- YYYY-MM-DD HH:MM
+            fim TEXT NOT NULL, -- Exclusivo
+            PRIMARY KEY (id_espera, inicio),
+            FOREIGN KEY (id_espera) REFERENCES lista_espera (id_espera) ON DELETE CASCADE
+        );
+        """
+
 def criar_tabelas(conn):
     """Cria as tabelas no banco de dados se não existirem."""
     cursor = conn.cursor()
@@ -39,7 +109,9 @@ def criar_tabelas(conn):
             id_paciente INTEGER PRIMARY KEY AUTOINCREMENT,
             nome TEXT NOT NULL,
             data_nascimento TEXT,
-            telefone TEXT
+            telefone TEXT,
+            telefone_normalizado TEXT, -- Só dígitos, ver normalizar_telefone
+            nome_fonetico TEXT -- Ver chave_fonetica
         );
         """)
 
@@ -49,11 +121,17 @@ def criar_tabelas(conn):
             id_medico INTEGER NOT NULL,
             id_paciente INTEGER NOT NULL,
             data_hora TEXT NOT NULL, -- Formato recomendado: YYYY-MM-DD HH:MM
-            observacoes TEXT,
+            observacoes TEXT, -- Não usada: ver consulta_observacao
             FOREIGN KEY (id_medico) REFERENCES medico (id_medico) ON DELETE CASCADE,
             FOREIGN KEY (id_paciente) REFERENCES paciente (id_paciente) ON DELETE CASCADE
         );
         """)
+
+        cursor.execute(SQL_CRIAR_CONSULTA_OBSERVACAO)
+        cursor.execute(SQL_CRIAR_LISTA_ESPERA)
+        cursor.execute(SQL_CRIAR_LISTA_ESPERA_JANELA)
+        criar_indices(conn)
+        cursor.execute(f"PRAGMA user_version = {VERSAO_ESQUEMA}") # Banco novo: nada a migrar
         conn.commit()
         print("Tabelas criadas com sucesso (se não existiam).")
     except sqlite3.Error as e:
@@ -61,29 +139,110 @@ def criar_tabelas(conn):
     finally:
         cursor.close()
 
-def inicializar_bd():
+def inicializar_bd(db_file=None, check_same_thread=True):
     """Inicializa o banco de dados: conecta e cria as tabelas."""
+    db_file = db_file or DB_FILE
     # Verifica se o arquivo do banco de dados existe e tem tamanho maior que 0
-    db_existe = os.path.exists(DB_FILE) and os.path.getsize(DB_FILE) > 0
+    db_existe = os.path.exists(db_file) and os.path.getsize(db_file) > 0
 
-    conn = conectar_bd()
+    conn = conectar_bd(db_file, check_same_thread)
     if conn:
         if not db_existe:
             print("Banco de dados não encontrado ou vazio. Criando tabelas...")
+            # Só tem efeito antes da primeira tabela; permite o vacuum incremental (manutencao_bd.py)
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
             criar_tabelas(conn)
         else:
             print("Banco de dados encontrado.")
+            migrar_bd(conn)
         return conn
     return None
 
+def criar_indices(conn):
+    """Cria os índices das chaves estrangeiras e de busca de pacientes duplicados.
+
+    Os índices em consulta e lista_espera evitam varrer a tabela inteira nas
+    exclusões em cascata e ao unir pacientes; o de data_hora atende as buscas
+    por período (ver lembretes_consulta.py). O de (telefone, nome fonético)
+    atende buscar_paciente_duplicado; não é único porque parentes que dividem o
+    telefone podem ter a mesma chave fonética ("Gabriel"/"Gabriela").
+    """
+    # (id_medico, data_hora) serve à chave estrangeira e à agenda de um médico
+    # por período; substitui o antigo índice só por id_medico
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_consulta_medico_data_hora ON consulta (id_medico, data_hora)")
+    conn.execute("DROP INDEX IF EXISTS idx_consulta_medico")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_consulta_paciente ON consulta (id_paciente)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_consulta_data_hora ON consulta (data_hora)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_lista_espera_medico ON lista_espera (id_medico)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_lista_espera_paciente ON lista_espera (id_paciente)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_paciente_nome_fonetico ON paciente (nome_fonetico, data_nascimento)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_paciente_telefone ON paciente (telefone_normalizado, nome_fonetico)")
+    conn.execute("DROP INDEX IF EXISTS idx_paciente_telefone_nome") # Antigo índice único
+
+def migrar_bd(conn):
+    """Atualiza um banco criado por versões anteriores para o esquema atual."""
+    cursor = conn.cursor()
+    try:
+        colunas_paciente = {linha[1] for linha in cursor.execute("PRAGMA table_info(paciente)")}
+        for coluna in ("telefone_normalizado", "nome_fonetico"):
+            if coluna not in colunas_paciente:
+                cursor.execute(f"ALTER TABLE paciente ADD COLUMN {coluna} TEXT")
+        # Preenche as colunas de busca dos pacientes antigos em um único UPDATE
+        conn.create_function("normalizar_telefone", 1, normalizar_telefone, deterministic=True)
+        conn.create_function("chave_fonetica", 1, chave_fonetica, deterministic=True)
+        cursor.execute("""
+        UPDATE paciente SET telefone_normalizado = normalizar_telefone(telefone),
+                            nome_fonetico = chave_fonetica(nome)
+        WHERE nome_fonetico IS NULL
+        """)
+        cursor.execute(SQL_CRIAR_LISTA_ESPERA)
+        cursor.execute(SQL_CRIAR_LISTA_ESPERA_JANELA)
+        criar_indices(conn)
+
+        cursor.execute(SQL_CRIAR_CONSULTA_OBSERVACAO)
+        versao = cursor.execute("PRAGMA user_version").fetchone()[0]
+        if versao < 1:
+            # Move as observações antigas da tabela consulta para consulta_observacao
+            # (varre a tabela inteira, então só roda uma vez)
+            cursor.execute("SELECT id_consulta, observacoes FROM consulta WHERE observacoes IS NOT NULL AND observacoes != ''")
+            pendentes = [(id_consulta, compactar_observacoes(texto)) for id_consulta, texto in cursor.fetchall()]
+            if pendentes:
+                cursor.executemany("INSERT OR REPLACE INTO consulta_observacao(id_consulta, dados) VALUES(?,?)", pendentes)
+                cursor.execute("UPDATE consulta SET observacoes = NULL WHERE observacoes IS NOT NULL")
+                print(f"{len(pendentes)} observações migradas para consulta_observacao.")
+        if versao < VERSAO_ESQUEMA:
+            cursor.execute(f"PRAGMA user_version = {VERSAO_ESQUEMA}")
+        conn.commit()
+    except sqlite3.Error as e:
+        print(f"Erro ao migrar banco de dados: {e}")
+        conn.rollback()
+    finally:
+        cursor.close()
+
+# Versão dos dados de cada tabela, incrementada a cada escrita confirmada.
+# As telas guardam a versão que carregaram para recarregar apenas o que mudou.
+versao_dados = {"medico": 0, "paciente": 0, "consulta": 0}
+
+def marcar_alterado(*tabelas):
+    """Registra que as tabelas indicadas foram alteradas."""
+    for tabela in tabelas:
+        versao_dados[tabela] += 1
+
+def _obter_cursor(conn, cursor):
+    """Retorna (cursor, proprio): reaproveita o cursor recebido ou cria um novo."""
+    if cursor is not None:
+        return cursor, False
+    return conn.cursor(), True
+
 # --- Funções CRUD para Médicos ---
 
-def adicionar_medico(conn, nome, especialidade):
+def adicionar_medico(conn, nome, especialidade, cursor=None):
     sql = 'INSERT INTO medico(nome, especialidade) VALUES(?,?)'
-    cursor = conn.cursor()
+    cursor, proprio = _obter_cursor(conn, cursor)
     try:
         cursor.execute(sql, (nome, especialidade))
         conn.commit()
+        marcar_alterado("medico")
         print(f"Médico '{nome}' adicionado com sucesso.")
         return cursor.lastrowid
     except sqlite3.Error as e:
@@ -91,10 +250,11 @@ def adicionar_medico(conn, nome, especialidade):
         conn.rollback()
         return None
     finally:
-        cursor.close()
+        if proprio:
+            cursor.close()
 
-def listar_medicos(conn):
-    cursor = conn.cursor()
+def listar_medicos(conn, cursor=None):
+    cursor, proprio = _obter_cursor(conn, cursor)
     try:
         cursor.execute("SELECT * FROM medico ORDER BY nome")
         return cursor.fetchall()
@@ -102,57 +262,176 @@ def listar_medicos(conn):
         print(f"Erro ao listar médicos: {e}")
         return []
     finally:
-        cursor.close()
+        if proprio:
+            cursor.close()
 
-def atualizar_medico(conn, id_medico, nome, especialidade):
+def atualizar_medico(conn, id_medico, nome, especialidade, cursor=None):
     sql = 'UPDATE medico SET nome = ?, especialidade = ? WHERE id_medico = ?'
-    cursor = conn.cursor()
+    cursor, proprio = _obter_cursor(conn, cursor)
     try:
         cursor.execute(sql, (nome, especialidade, id_medico))
+        alterado = cursor.rowcount > 0 # Antes de _invalidar_cache, que reutiliza o cursor
         conn.commit()
+        marcar_alterado("medico", "consulta")
+        _invalidar_cache(conn, cursor, id_medico)
         print(f"Médico ID {id_medico} atualizado com sucesso.")
-        return cursor.rowcount > 0
+        return alterado
     except sqlite3.Error as e:
         print(f"Erro ao atualizar médico: {e}")
         conn.rollback()
         return False
     finally:
-        cursor.close()
+        if proprio:
+            cursor.close()
 
-def deletar_medico(conn, id_medico):
+def deletar_medico(conn, id_medico, cursor=None):
     sql = 'DELETE FROM medico WHERE id_medico = ?'
-    cursor = conn.cursor()
+    cursor, proprio = _obter_cursor(conn, cursor)
     try:
         cursor.execute(sql, (id_medico,))
+        alterado = cursor.rowcount > 0 # Antes de _invalidar_cache, que reutiliza o cursor
         conn.commit()
+        marcar_alterado("medico", "consulta")
+        _invalidar_cache(conn, cursor, id_medico)
         print(f"Médico ID {id_medico} deletado com sucesso.")
-        return cursor.rowcount > 0
+        return alterado
     except sqlite3.Error as e:
         print(f"Erro ao deletar médico: {e}")
         conn.rollback()
         return False
     finally:
-        cursor.close()
+        if proprio:
+            cursor.close()
 
 # --- Funções CRUD para Pacientes ---
 
-def adicionar_paciente(conn, nome, data_nascimento, telefone):
-    sql = 'INSERT INTO paciente(nome, data_nascimento, telefone) VALUES(?,?,?)'
-    cursor = conn.cursor()
+# Partículas ignoradas na chave fonética ("Maria da Silva" ~ "Maria Silva")
+PARTICULAS_NOME = {"da", "de", "do", "das", "dos", "e"}
+
+# Substituições aplicadas antes de descartar as vogais, na ordem da lista
+REGRAS_FONETICAS = [(re.compile(padrao), troca) for padrao, troca in (
+    (r"ph", "f"), (r"th", "t"), (r"[cs]h", "x"), (r"lh", "l"), (r"nh", "n"),
+    (r"qu|gu(?=[ei])", lambda m: "k" if m.group(0) == "qu" else "g"),
+    (r"c(?=[ei])", "s"), (r"[cq]", "k"), (r"z", "s"), (r"y", "i"), (r"w", "v"), (r"h", ""),
+)]
+
+def normalizar_telefone(telefone):
+    """Reduz um telefone aos dígitos, sem código do país (55) nem zero de operadora.
+
+    "(11) 98765-4321", "+55 11 98765 4321" e "011987654321" viram "11987654321".
+    Retorna None se não sobrar um número plausível (menos de 8 dígitos).
+    """
+    if not telefone:
+        return None
+    digitos = re.sub(r"\D", "", telefone)
+    if digitos.startswith("00"):
+        digitos = digitos[2:]
+    if digitos.startswith("55") and len(digitos) in (12, 13):
+        digitos = digitos[2:]
+    elif digitos.startswith("0") and len(digitos) in (11, 12):
+        digitos = digitos[1:]
+    return digitos if len(digitos) >= 8 else None
+
+def _sem_acentos(texto):
+    return unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode("ascii").lower()
+
+@lru_cache(maxsize=65536)
+def _palavra_fonetica(palavra):
+    # Nomes e sobrenomes se repetem muito, então o resultado por palavra fica em cache
+    for padrao, troca in REGRAS_FONETICAS:
+        palavra = padrao.sub(troca, palavra)
+    return palavra
+
+def _palavras_foneticas(nome):
+    """Palavras do nome sem acentos e partículas, com as grafias de mesmo som unificadas."""
+    palavras = (_palavra_fonetica(palavra) for palavra in re.findall(r"[a-z]+", _sem_acentos(nome or ""))
+                if palavra not in PARTICULAS_NOME)
+    return [palavra for palavra in palavras if palavra]
+
+def chave_fonetica(nome):
+    """Chave fonética simplificada para nomes em português.
+
+    Remove acentos e partículas, unifica grafias com o mesmo som (ph/f, ç/ss/s,
+    y/i, ...) e mantém só a primeira letra e as consoantes de cada palavra, sem
+    repetições: "Marya da Sylva" e "Maria Silva" viram "mr slv".
+    """
+    chaves = (palavra[0] + re.sub(r"[aeiou]", "", palavra[1:]) for palavra in _palavras_foneticas(nome))
+    return " ".join(re.sub(r"(.)\1+", r"\1", chave) for chave in chaves)
+
+def similaridade_nomes(nome_a, nome_b):
+    """Similaridade (0 a 1) entre dois nomes pelos trigramas em comum (Jaccard).
+
+    Compara as formas de _palavras_foneticas, então diferenças só de grafia
+    ("Sylva"/"Silva") não reduzem a similaridade.
+    """
+    def trigramas(nome):
+        texto = f"  {' '.join(_palavras_foneticas(nome))} "
+        return {texto[i:i + 3] for i in range(len(texto) - 2)}
+    a, b = trigramas(nome_a), trigramas(nome_b)
+    return len(a & b) / len(a | b) if a | b else 0.0
+
+def normalizar_nome(nome):
+    """Nome sem acentos, maiúsculas, pontuação nem espaços repetidos: "  JOSÉ  da Silva." vira "jose da silva"."""
+    return " ".join(re.findall(r"[a-z]+", _sem_acentos(nome or "")))
+
+def _pacientes_mesmo_telefone(cursor, nome, telefone):
+    """Pacientes com o mesmo telefone normalizado e a mesma chave fonética: (id, nome, data_nascimento)."""
+    telefone_normalizado = normalizar_telefone(telefone)
+    if telefone_normalizado is None:
+        return []
+    cursor.execute('SELECT id_paciente, nome, data_nascimento FROM paciente WHERE telefone_normalizado = ? AND nome_fonetico = ?',
+                   (telefone_normalizado, chave_fonetica(nome)))
+    return cursor.fetchall()
+
+def buscar_paciente_duplicado(conn, nome, telefone, data_nascimento, cursor=None):
+    """Retorna o ID de um paciente com o mesmo telefone, nome e data de nascimento, ou None.
+
+    Os nomes são comparados por normalizar_nome: a chave fonética sozinha não
+    basta, porque "Gabriel" e "Gabriela" Souza, irmãos com o mesmo telefone, têm
+    a mesma chave. Esses casos ficam para deduplicacao_pacientes.py --revisar.
+    """
+    cursor, proprio = _obter_cursor(conn, cursor)
+    try:
+        nome_normalizado = normalizar_nome(nome)
+        for id_paciente, nome_existente, nascimento_existente in _pacientes_mesmo_telefone(cursor, nome, telefone):
+            if normalizar_nome(nome_existente) == nome_normalizado and (nascimento_existente or "") == (data_nascimento or ""):
+                return id_paciente
+        return None
+    except sqlite3.Error as e:
+        print(f"Erro ao buscar paciente duplicado: {e}")
+        return None
+    finally:
+        if proprio:
+            cursor.close()
+
+def adicionar_paciente(conn, nome, data_nascimento, telefone, cursor=None):
+    """Cadastra um paciente. Se ele já existir (ver buscar_paciente_duplicado), retorna o ID existente."""
+    sql = 'INSERT INTO paciente(nome, data_nascimento, telefone, telefone_normalizado, nome_fonetico) VALUES(?,?,?,?,?)'
+    cursor, proprio = _obter_cursor(conn, cursor)
     try:
-        cursor.execute(sql, (nome, data_nascimento, telefone))
+        id_existente = buscar_paciente_duplicado(conn, nome, telefone, data_nascimento, cursor=cursor)
+        if id_existente is not None:
+            print(f"Paciente '{nome}' já cadastrado (ID {id_existente}).")
+            return id_existente
+        parecidos = [linha[0] for linha in _pacientes_mesmo_telefone(cursor, nome, telefone)]
+        cursor.execute(sql, (nome, data_nascimento, telefone, normalizar_telefone(telefone), chave_fonetica(nome)))
         conn.commit()
+        marcar_alterado("paciente")
         print(f"Paciente '{nome}' adicionado com sucesso.")
+        if parecidos:
+            print(f"Mesmo telefone e nome parecido com o(s) paciente(s) {parecidos}: "
+                  "confira com deduplicacao_pacientes.py --revisar.")
         return cursor.lastrowid
     except sqlite3.Error as e:
         print(f"Erro ao adicionar paciente: {e}")
         conn.rollback()
         return None
     finally:
-        cursor.close()
+        if proprio:
+            cursor.close()
 
-def listar_pacientes(conn):
-    cursor = conn.cursor()
+def listar_pacientes(conn, cursor=None):
+    cursor, proprio = _obter_cursor(conn, cursor)
     try:
         cursor.execute("SELECT * FROM paciente ORDER BY nome")
         return cursor.fetchall()
@@ -160,14 +439,18 @@ def listar_pacientes(conn):
         print(f"Erro ao listar pacientes: {e}")
         return []
     finally:
-        cursor.close()
+        if proprio:
+            cursor.close()
 
-def atualizar_paciente(conn, id_paciente, nome, data_nascimento, telefone):
-    sql = 'UPDATE paciente SET nome = ?, data_nascimento = ?, telefone = ? WHERE id_paciente = ?'
-    cursor = conn.cursor()
+def atualizar_paciente(conn, id_paciente, nome, data_nascimento, telefone, cursor=None):
+    sql = ('UPDATE paciente SET nome = ?, data_nascimento = ?, telefone = ?, telefone_normalizado = ?, nome_fonetico = ? '
+           'WHERE id_paciente = ?')
+    cursor, proprio = _obter_cursor(conn, cursor)
     try:
-        cursor.execute(sql, (nome, data_nascimento, telefone, id_paciente))
+        cursor.execute(sql, (nome, data_nascimento, telefone, normalizar_telefone(telefone), chave_fonetica(nome), id_paciente))
         conn.commit()
+        marcar_alterado("paciente", "consulta")
+        _limpar_cache(conn)
         print(f"Paciente ID {id_paciente} atualizado com sucesso.")
         return cursor.rowcount > 0
     except sqlite3.Error as e:
@@ -175,14 +458,17 @@ def atualizar_paciente(conn, id_paciente, nome, data_nascimento, telefone):
         conn.rollback()
         return False
     finally:
-        cursor.close()
+        if proprio:
+            cursor.close()
 
-def deletar_paciente(conn, id_paciente):
+def deletar_paciente(conn, id_paciente, cursor=None):
     sql = 'DELETE FROM paciente WHERE id_paciente = ?'
-    cursor = conn.cursor()
+    cursor, proprio = _obter_cursor(conn, cursor)
     try:
         cursor.execute(sql, (id_paciente,))
         conn.commit()
+        marcar_alterado("paciente", "consulta")
+        _limpar_cache(conn)
         print(f"Paciente ID {id_paciente} deletado com sucesso.")
         return cursor.rowcount > 0
     except sqlite3.Error as e:
@@ -190,34 +476,80 @@ def deletar_paciente(conn, id_paciente):
         conn.rollback()
         return False
     finally:
-        cursor.close()
+        if proprio:
+            cursor.close()
 
 # --- Funções CRUD para Consultas ---
 
-def adicionar_consulta(conn, id_medico, id_paciente, data_hora, observacoes):
-    sql = 'INSERT INTO consulta(id_medico, id_paciente, data_hora, observacoes) VALUES(?,?,?,?)'
-    cursor = conn.cursor()
+def compactar_observacoes(texto):
+    return zlib.compress(texto.encode("utf-8"))
+
+def descompactar_observacoes(dados):
+    return zlib.decompress(dados).decode("utf-8")
+
+def _gravar_observacoes(cursor, id_consulta, observacoes):
+    """Grava (ou apaga, se vazias) as observações de uma consulta, sem confirmar a transação."""
+    if observacoes:
+        cursor.execute('INSERT OR REPLACE INTO consulta_observacao(id_consulta, dados) VALUES(?,?)',
+                       (id_consulta, compactar_observacoes(observacoes)))
+    else:
+        cursor.execute('DELETE FROM consulta_observacao WHERE id_consulta = ?', (id_consulta,))
+
+def obter_observacoes(conn, id_consulta, cursor=None):
+    """Retorna as observações de uma consulta ('' se não houver)."""
+    cursor, proprio = _obter_cursor(conn, cursor)
     try:
-        cursor.execute(sql, (id_medico, id_paciente, data_hora, observacoes))
-        conn.commit()
+        cursor.execute('SELECT dados FROM consulta_observacao WHERE id_consulta = ?', (id_consulta,))
+        linha = cursor.fetchone()
+        return descompactar_observacoes(linha[0]) if linha else ""
+    except (sqlite3.Error, zlib.error) as e:
+        print(f"Erro ao obter observações: {e}")
+        return ""
+    finally:
+        if proprio:
+            cursor.close()
+
+def adicionar_consulta(conn, id_medico, id_paciente, data_hora, observacoes, cursor=None, confirmar=True):
+    """Agenda uma consulta e retorna o seu ID (None em caso de erro).
+
+    Com confirmar=False a transação fica aberta (nem commit nem rollback),
+    para fazer parte de uma operação maior (ver ListaEspera.cancelar_consulta).
+    """
+    sql = 'INSERT INTO consulta(id_medico, id_paciente, data_hora) VALUES(?,?,?)'
+    cursor, proprio = _obter_cursor(conn, cursor)
+    try:
+        cursor.execute(sql, (id_medico, id_paciente, data_hora))
+        id_consulta = cursor.lastrowid
+        _gravar_observacoes(cursor, id_consulta, observacoes)
+        if confirmar:
+            conn.commit()
+        marcar_alterado("consulta")
+        _invalidar_cache(conn, cursor, id_medico, data_hora)
         print(f"Consulta agendada para {data_hora} com sucesso.")
-        return cursor.lastrowid
+        return id_consulta
     except sqlite3.Error as e:
         print(f"Erro ao agendar consulta: {e}")
-        conn.rollback()
+        if confirmar:
+            conn.rollback()
         return None
     finally:
-        cursor.close()
+        if proprio:
+            cursor.close()
+
+# Colunas retornadas por listar_consultas, na ordem do SELECT
+# (as observações não entram nas listagens: ver obter_observacoes)
+COLUNAS_CONSULTA = ("id_consulta", "data_hora", "nome_medico", "nome_paciente",
+                    "id_medico", "id_paciente")
+
+# Linha compacta (tupla nomeada, sem o dicionário de colunas do sqlite3.Row)
+ConsultaLinha = namedtuple("ConsultaLinha", COLUNAS_CONSULTA)
 
-def listar_consultas(conn):
-    """Lista todas as consultas com nomes de médico e paciente."""
-    sql = """
+SQL_LISTAR_CONSULTAS = """
     SELECT
         c.id_consulta,
         c.data_hora,
         m.nome AS nome_medico,
         p.nome AS nome_paciente,
-        c.observacoes,
         c.id_medico,
         c.id_paciente
     FROM consulta c
@@ -225,45 +557,631 @@ def listar_consultas(conn):
     JOIN paciente p ON c.id_paciente = p.id_paciente
     ORDER BY c.data_hora
     """
-    cursor = conn.cursor()
+
+def listar_consultas(conn, cursor=None, formato="row"):
+    """Lista todas as consultas com nomes de médico e paciente.
+
+    `formato` define o tipo de cada linha:
+    - "row": sqlite3.Row, acesso por nome de coluna (padrão);
+    - "nomeada": ConsultaLinha, acesso por atributo ou índice;
+    - "tupla": tupla simples, a opção mais leve para listagens grandes.
+    """
+    cursor, proprio = _obter_cursor(conn, cursor)
+    row_factory_original = cursor.row_factory
     try:
-        cursor.execute(sql)
-        return cursor.fetchall()
+        if formato != "row":
+            cursor.row_factory = None
+        cursor.execute(SQL_LISTAR_CONSULTAS)
+        linhas = cursor.fetchall()
+        if formato == "nomeada":
+            return list(map(ConsultaLinha._make, linhas))
+        return linhas
     except sqlite3.Error as e:
         print(f"Erro ao listar consultas: {e}")
         return []
     finally:
-        cursor.close()
+        cursor.row_factory = row_factory_original
+        if proprio:
+            cursor.close()
+
+def listar_consultas_colunas(conn, tamanho_lote=10000):
+    """Percorre as consultas em lotes colunares, para exportações e relatórios grandes.
 
-def atualizar_consulta(conn, id_consulta, id_medico, id_paciente, data_hora, observacoes):
-    sql = 'UPDATE consulta SET id_medico = ?, id_paciente = ?, data_hora = ?, observacoes = ? WHERE id_consulta = ?'
+    Cada lote é um dicionário coluna -> valores: as colunas de ID usam array('q')
+    e as de texto, listas. Nenhum objeto por linha é mantido entre os lotes.
+    """
     cursor = conn.cursor()
+    cursor.row_factory = None
+    try:
+        cursor.execute(SQL_LISTAR_CONSULTAS)
+        while True:
+            linhas = cursor.fetchmany(tamanho_lote)
+            if not linhas:
+                break
+            colunas = list(zip(*linhas))
+            yield {
+                nome: array('q', valores) if nome.startswith("id_") else list(valores)
+                for nome, valores in zip(COLUNAS_CONSULTA, colunas)
+            }
+    except sqlite3.Error as e:
+        print(f"Erro ao listar consultas: {e}")
+    finally:
+        cursor.close()
+
+def atualizar_consulta(conn, id_consulta, id_medico, id_paciente, data_hora, observacoes, cursor=None):
+    sql = 'UPDATE consulta SET id_medico = ?, id_paciente = ?, data_hora = ? WHERE id_consulta = ?'
+    cursor, proprio = _obter_cursor(conn, cursor)
     try:
-        cursor.execute(sql, (id_medico, id_paciente, data_hora, observacoes, id_consulta))
+        anterior = _consulta_atual(conn, cursor, id_consulta)
+        cursor.execute(sql, (id_medico, id_paciente, data_hora, id_consulta))
+        atualizada = cursor.rowcount > 0
+        if atualizada:
+            _gravar_observacoes(cursor, id_consulta, observacoes)
         conn.commit()
+        marcar_alterado("consulta")
+        if anterior:
+            _invalidar_cache(conn, cursor, *anterior)
+            _invalidar_cache(conn, cursor, id_medico, data_hora)
         print(f"Consulta ID {id_consulta} atualizada com sucesso.")
-        return cursor.rowcount > 0
+        return atualizada
     except sqlite3.Error as e:
         print(f"Erro ao atualizar consulta: {e}")
         conn.rollback()
         return False
     finally:
-        cursor.close()
+        if proprio:
+            cursor.close()
 
-def deletar_consulta(conn, id_consulta):
+def deletar_consulta(conn, id_consulta, cursor=None, confirmar=True):
+    """Deleta uma consulta. confirmar=False deixa a transação aberta, como em adicionar_consulta."""
     sql = 'DELETE FROM consulta WHERE id_consulta = ?'
-    cursor = conn.cursor()
+    cursor, proprio = _obter_cursor(conn, cursor)
     try:
+        anterior = _consulta_atual(conn, cursor, id_consulta)
         cursor.execute(sql, (id_consulta,))
-        conn.commit()
+        deletada = cursor.rowcount > 0 # Antes de _invalidar_cache, que reutiliza o cursor
+        if confirmar:
+            conn.commit()
+        marcar_alterado("consulta")
+        if anterior:
+            _invalidar_cache(conn, cursor, *anterior)
         print(f"Consulta ID {id_consulta} deletada com sucesso.")
-        return cursor.rowcount > 0
+        return deletada
     except sqlite3.Error as e:
         print(f"Erro ao deletar consulta: {e}")
-        conn.rollback()
+        if confirmar:
+            conn.rollback()
         return False
     finally:
-        cursor.close()
+        if proprio:
+            cursor.close()
+
+def adicionar_consultas_lote(conn, consultas, cursor=None, confirmar=True, retornar_ids=False):
+    """Agenda várias consultas em uma única transação.
+
+    `consultas` é uma sequência de tuplas (id_medico, id_paciente, data_hora, observacoes).
+    Retorna o número de consultas agendadas (com retornar_ids=True, a lista
+    dos IDs na ordem de `consultas`) ou None se o lote falhar (nada é gravado).
+    Com confirmar=False a transação fica aberta, como em adicionar_consulta.
+    """
+    sql = 'INSERT INTO consulta(id_medico, id_paciente, data_hora) VALUES(?,?,?)'
+    cursor, proprio = _obter_cursor(conn, cursor)
+    try:
+        # Sem observações (e sem pedir os IDs): um único executemany; nos demais
+        # casos o ID de cada consulta é necessário, e elas são gravadas uma a uma
+        consultas = list(consultas)
+        ids = []
+        if not retornar_ids:
+            cursor.executemany(sql, (c[:3] for c in consultas if not c[3]))
+        for id_medico, id_paciente, data_hora, observacoes in (c for c in consultas if retornar_ids or c[3]):
+            cursor.execute(sql, (id_medico, id_paciente, data_hora))
+            ids.append(cursor.lastrowid)
+            _gravar_observacoes(cursor, cursor.lastrowid, observacoes)
+        if confirmar:
+            conn.commit()
+        marcar_alterado("consulta")
+        # Lotes pequenos invalidam só as agendas afetadas; os grandes, o cache todo
+        if len(consultas) <= LIMITE_INVALIDACAO_LOTE:
+            for id_medico, _, data_hora, _ in consultas:
+                _invalidar_cache(conn, cursor, id_medico, data_hora)
+        else:
+            _limpar_cache(conn)
+        print(f"{len(consultas)} consultas agendadas em lote com sucesso.")
+        return ids if retornar_ids else len(consultas)
+    except sqlite3.Error as e:
+        print(f"Erro ao agendar consultas em lote: {e}")
+        if confirmar:
+            conn.rollback()
+        return None
+    finally:
+        if proprio:
+            cursor.close()
+
+def deletar_consultas_lote(conn, ids_consulta, cursor=None):
+    """Deleta várias consultas em uma única transação. Retorna quantas foram removidas."""
+    sql = 'DELETE FROM consulta WHERE id_consulta = ?'
+    cursor, proprio = _obter_cursor(conn, cursor)
+    try:
+        cursor.executemany(sql, ((id_consulta,) for id_consulta in ids_consulta))
+        conn.commit()
+        marcar_alterado("consulta")
+        _limpar_cache(conn)
+        print(f"{cursor.rowcount} consultas deletadas em lote com sucesso.")
+        return cursor.rowcount
+    except sqlite3.Error as e:
+        print(f"Erro ao deletar consultas em lote: {e}")
+        conn.rollback()
+        return 0
+    finally:
+        if proprio:
+            cursor.close()
+
+# --- Cache das agendas filtradas ---
+
+SQL_LISTAR_CONSULTAS_PERIODO = """
+    SELECT
+        c.id_consulta,
+        c.data_hora,
+        m.nome AS nome_medico,
+        p.nome AS nome_paciente,
+        c.id_medico,
+        c.id_paciente
+    FROM consulta c
+    JOIN medico m ON c.id_medico = m.id_medico
+    JOIN paciente p ON c.id_paciente = p.id_paciente
+    WHERE c.data_hora >= ? AND c.data_hora < ?
+    """
+
+def _normalizar_data_hora(valor):
+    """Aceita date, datetime ou texto e retorna o texto no formato YYYY-MM-DD HH:MM."""
+    if hasattr(valor, "hour"):
+        return valor.strftime("%Y-%m-%d %H:%M")
+    if hasattr(valor, "year"):
+        return valor.strftime("%Y-%m-%d 00:00")
+    valor = str(valor).strip()
+    return valor if len(valor) > 10 else valor + " 00:00"
+
+def listar_consultas_periodo(conn, inicio, fim, id_medico=None, especialidade=None, cursor=None):
+    """Lista as consultas com inicio <= data_hora < fim, opcionalmente de um médico ou especialidade.
+
+    Retorna tuplas na ordem de COLUNAS_CONSULTA. A faixa de datas usa o índice
+    idx_consulta_data_hora.
+    """
+    sql = SQL_LISTAR_CONSULTAS_PERIODO
+    parametros = [_normalizar_data_hora(inicio), _normalizar_data_hora(fim)]
+    if id_medico is not None:
+        sql += " AND c.id_medico = ?"
+        parametros.append(id_medico)
+    if especialidade is not None:
+        sql += " AND m.especialidade = ?"
+        parametros.append(especialidade)
+    sql += " ORDER BY c.data_hora"
+    cursor, proprio = _obter_cursor(conn, cursor)
+    row_factory_original = cursor.row_factory
+    try:
+        cursor.row_factory = None
+        cursor.execute(sql, parametros)
+        return cursor.fetchall()
+    except sqlite3.Error as e:
+        print(f"Erro ao listar consultas do período: {e}")
+        return []
+    finally:
+        cursor.row_factory = row_factory_original
+        if proprio:
+            cursor.close()
+
+class CacheConsultas:
+    """Cache LRU dos resultados de consultar_agenda, com validade (TTL) e limite de memória.
+
+    A chave são os parâmetros normalizados (inicio, fim, id_medico,
+    especialidade). As escritas feitas pelas funções CRUD na mesma conexão
+    invalidam só as entradas cujo período contém a consulta alterada e cujo
+    filtro inclui o médico dela; escritas de outros processos só são vistas
+    quando a entrada expira.
+    """
+
+    def __init__(self, max_entradas=256, ttl=300, max_bytes=16 * 2**20):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.entradas = OrderedDict() # chave -> (expira_em, tamanho, linhas), da menos para a mais usada
+        self.bytes = 0
+        self.acertos = 0
+        self.falhas = 0
+        self.invalidadas = 0
+        self.expulsas = 0
+
+    @staticmethod
+    def chave(inicio, fim, id_medico=None, especialidade=None):
+        return (_normalizar_data_hora(inicio), _normalizar_data_hora(fim),
+                None if id_medico is None else int(id_medico),
+                None if especialidade is None else especialidade.strip())
+
+    @staticmethod
+    def _tamanho(linhas):
+        """Estimativa dos bytes ocupados pelas linhas (tupla, campos e lista)."""
+        return sys.getsizeof(linhas) + sum(
+            sys.getsizeof(linha) + sum(sys.getsizeof(campo) for campo in linha) for linha in linhas)
+
+    def obter(self, chave, carregar):
+        """Retorna as linhas em cache para `chave` ou chama carregar() e guarda o resultado."""
+        agora = time.monotonic()
+        entrada = self.entradas.get(chave)
+        if entrada is not None:
+            if entrada[0] > agora:
+                self.entradas.move_to_end(chave)
+                self.acertos += 1
+                return entrada[2]
+            self._remover(chave)
+        self.falhas += 1
+        linhas = tuple(carregar()) # Imutável: o mesmo resultado é entregue a vários chamadores
+        tamanho = self._tamanho(linhas)
+        if tamanho <= self.max_bytes:
+            self.entradas[chave] = (agora + self.ttl, tamanho, linhas)
+            self.bytes += tamanho
+            while len(self.entradas) > self.max_entradas or self.bytes > self.max_bytes:
+                self._remover(next(iter(self.entradas)))
+                self.expulsas += 1
+        return linhas
+
+    def _remover(self, chave):
+        self.bytes -= self.entradas.pop(chave)[1]
+
+    def invalidar(self, id_medico=None, data_hora=None, especialidade=None):
+        """Remove as entradas que podem conter uma consulta do médico em data_hora.
+
+        Parâmetros None valem para qualquer valor: sem data_hora, todas as
+        datas do médico; sem especialidade, todas as entradas por especialidade.
+        """
+        afetadas = [
+            chave for chave in self.entradas
+            if (data_hora is None or chave[0] <= data_hora < chave[1])
+            and (id_medico is None or chave[2] is None or chave[2] == id_medico)
+            and (especialidade is None or chave[3] is None or chave[3] == especialidade.strip())
+        ]
+        for chave in afetadas:
+            self._remover(chave)
+        self.invalidadas += len(afetadas)
+
+    def limpar(self):
+        self.invalidadas += len(self.entradas)
+        self.entradas.clear()
+        self.bytes = 0
+
+    def __len__(self):
+        return len(self.entradas)
+
+    def estatisticas(self):
+        consultas = self.acertos + self.falhas
+        return {
+            "acertos": self.acertos,
+            "falhas": self.falhas,
+            "taxa_acerto": self.acertos / consultas if consultas else 0.0,
+            "entradas": len(self.entradas),
+            "bytes": self.bytes,
+            "invalidadas": self.invalidadas,
+            "expulsas": self.expulsas,
+        }
+
+# Conexão -> CacheConsultas, apenas das conexões com o cache ativado
+caches_consultas = {}
+
+def ativar_cache_consultas(conn, **opcoes):
+    """Ativa o cache de agendas para a conexão (opções de CacheConsultas) e o retorna."""
+    cache = caches_consultas.get(conn)
+    if cache is None:
+        cache = caches_consultas[conn] = CacheConsultas(**opcoes)
+    return cache
+
+def desativar_cache_consultas(conn):
+    caches_consultas.pop(conn, None)
+
+def _invalidar_cache(conn, cursor, id_medico=None, data_hora=None):
+    """Invalida, no cache da conexão (se ativo), as agendas afetadas por uma escrita."""
+    cache = caches_consultas.get(conn)
+    if not cache:
+        return
+    especialidade = None
+    if id_medico is not None and data_hora is not None:
+        cursor.execute('SELECT especialidade FROM medico WHERE id_medico = ?', (id_medico,))
+        linha = cursor.fetchone()
+        especialidade = linha[0] if linha else None
+    cache.invalidar(None if id_medico is None else int(id_medico),
+                    None if data_hora is None else _normalizar_data_hora(data_hora), especialidade)
+
+def _limpar_cache(conn):
+    cache = caches_consultas.get(conn)
+    if cache:
+        cache.limpar()
+
+def _consulta_atual(conn, cursor, id_consulta):
+    """(id_medico, data_hora) da consulta antes de uma alteração, se o cache estiver ativo."""
+    if not caches_consultas.get(conn):
+        return None
+    cursor.execute('SELECT id_medico, data_hora FROM consulta WHERE id_consulta = ?', (id_consulta,))
+    return cursor.fetchone()
+
+def consultar_agenda(conn, inicio, fim, id_medico=None, especialidade=None):
+    """Como listar_consultas_periodo, mas usando o cache da conexão quando ativo."""
+    cache = caches_consultas.get(conn)
+    if cache is None:
+        return listar_consultas_periodo(conn, inicio, fim, id_medico, especialidade)
+    chave = cache.chave(inicio, fim, id_medico, especialidade)
+    return cache.obter(chave, lambda: listar_consultas_periodo(conn, *chave))
+
+def agenda_do_dia(conn, id_medico, dia=None):
+    """Consultas de um médico no dia (padrão: hoje)."""
+    dia = dia or date.today()
+    return consultar_agenda(conn, dia, dia + timedelta(days=1), id_medico=id_medico)
+
+def agenda_da_semana(conn, especialidade, dia=None):
+    """Consultas de uma especialidade na semana (segunda a domingo) do dia indicado (padrão: hoje)."""
+    dia = dia or date.today()
+    segunda = dia - timedelta(days=dia.weekday())
+    return consultar_agenda(conn, segunda, segunda + timedelta(days=7), especialidade=especialidade)
+
+# --- Lista de espera ---
+
+PRIORIDADE_URGENTE = 1
+PRIORIDADE_NORMAL = 3
+
+class ListaEspera:
+    """Lista de espera persistida em lista_espera, com um heap em memória por fila.
+
+    Cada pedido aguarda um médico específico (fila ("medico", id)) ou qualquer
+    médico de uma especialidade (fila ("especialidade", nome)). Os heaps são
+    ordenados por (prioridade, data_pedido, id_espera), então escolher o
+    próximo paciente quando um horário é liberado custa O(log n). Pedidos que
+    saem da lista só são retirados do heap quando chegam ao topo.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.filas = {} # Chave da fila -> heap de (prioridade, data_pedido, id_espera)
+        self.pedidos = {} # id_espera -> id_paciente, apenas dos pedidos aguardando
+        self.carregar()
+
+    @staticmethod
+    def _chave(id_medico, especialidade):
+        if id_medico is not None:
+            return ("medico", int(id_medico))
+        return ("especialidade", (especialidade or "").strip().casefold())
+
+    def carregar(self):
+        """(Re)constrói os heaps a partir dos pedidos aguardando no banco."""
+        self.filas = {}
+        self.pedidos = {}
+        cursor = self.conn.cursor()
+        cursor.row_factory = None
+        try:
+            cursor.execute("""
+            SELECT id_espera, id_paciente, id_medico, especialidade, prioridade, data_pedido
+            FROM lista_espera WHERE situacao = 'aguardando'
+            """)
+            for id_espera, id_paciente, id_medico, especialidade, prioridade, data_pedido in cursor:
+                self.filas.setdefault(self._chave(id_medico, especialidade), []).append(
+                    (prioridade, data_pedido, id_espera))
+                self.pedidos[id_espera] = id_paciente
+        except sqlite3.Error as e:
+            print(f"Erro ao carregar lista de espera: {e}")
+        finally:
+            cursor.close()
+        for fila in self.filas.values():
+            heapq.heapify(fila)
+
+    def __len__(self):
+        return len(self.pedidos)
+
+    def adicionar(self, id_paciente, id_medico=None, especialidade=None, prioridade=PRIORIDADE_NORMAL, janelas=()):
+        """Coloca o paciente na lista de espera de um médico ou de uma especialidade.
+
+        `janelas` são os períodos preferidos, pares (inicio, fim) no formato
+        YYYY-MM-DD HH:MM. Retorna o ID do pedido ou None em caso de erro.
+        """
+        if id_medico is None and not especialidade:
+            raise ValueError("Informe o médico ou a especialidade do pedido.")
+        data_pedido = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        sql = ('INSERT INTO lista_espera(id_paciente, id_medico, especialidade, prioridade, data_pedido) '
+               'VALUES(?,?,?,?,?)')
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(sql, (id_paciente, id_medico, especialidade, prioridade, data_pedido))
+            id_espera = cursor.lastrowid
+            cursor.executemany('INSERT INTO lista_espera_janela(id_espera, inicio, fim) VALUES(?,?,?)',
+                               ((id_espera, inicio, fim) for inicio, fim in janelas))
+            self.conn.commit()
+        except sqlite3.Error as e:
+            print(f"Erro ao adicionar à lista de espera: {e}")
+            self.conn.rollback()
+            return None
+        finally:
+            cursor.close()
+        heapq.heappush(self.filas.setdefault(self._chave(id_medico, especialidade), []),
+                       (prioridade, data_pedido, id_espera))
+        self.pedidos[id_espera] = id_paciente
+        print(f"Paciente ID {id_paciente} adicionado à lista de espera.")
+        return id_espera
+
+    def remover(self, id_espera):
+        """Cancela um pedido da lista de espera. Retorna False se ele não estava aguardando."""
+        sql = "UPDATE lista_espera SET situacao = 'cancelado' WHERE id_espera = ? AND situacao = 'aguardando'"
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(sql, (id_espera,))
+            self.conn.commit()
+            self.pedidos.pop(id_espera, None)
+            return cursor.rowcount > 0
+        except sqlite3.Error as e:
+            print(f"Erro ao remover da lista de espera: {e}")
+            self.conn.rollback()
+            return False
+        finally:
+            cursor.close()
+
+    def _melhor_pedido(self, chave, id_paciente_excluido):
+        """Topo válido da fila `chave` (sem retirá-lo), ignorando o paciente indicado."""
+        fila = self.filas.get(chave)
+        ignorados = []
+        melhor = None
+        while fila:
+            pedido = fila[0]
+            id_paciente = self.pedidos.get(pedido[2])
+            if id_paciente is None: # Já saiu da lista
+                heapq.heappop(fila)
+            elif id_paciente == id_paciente_excluido:
+                ignorados.append(heapq.heappop(fila))
+            else:
+                melhor = pedido
+                break
+        for pedido in ignorados:
+            heapq.heappush(fila, pedido)
+        return melhor
+
+    def _preencher_horario(self, cursor, id_medico, especialidade, data_hora, id_paciente_excluido):
+        """Agenda o melhor pedido aguardando no horário liberado, sem confirmar a transação.
+
+        Retorna (id_consulta, id_espera) ou None se não houver candidato.
+        """
+        chaves = [self._chave(id_medico, None)]
+        if especialidade:
+            chaves.append(self._chave(None, especialidade))
+        while True:
+            candidatos = [pedido for pedido in (self._melhor_pedido(chave, id_paciente_excluido) for chave in chaves)
+                          if pedido is not None]
+            if not candidatos:
+                return None
+            id_espera = min(candidatos)[2]
+            # Confere no banco: o pedido pode ter sido removido em cascata ou por outra conexão
+            cursor.execute("SELECT id_paciente FROM lista_espera WHERE id_espera = ? AND situacao = 'aguardando'",
+                           (id_espera,))
+            linha = cursor.fetchone()
+            if linha is None:
+                self.pedidos.pop(id_espera, None)
+                continue
+            id_consulta = adicionar_consulta(self.conn, id_medico, linha[0], data_hora,
+                                             f"Agendada pela lista de espera (pedido {id_espera}).",
+                                             cursor=cursor, confirmar=False)
+            if id_consulta is None:
+                return None
+            cursor.execute("UPDATE lista_espera SET situacao = 'agendado', id_consulta = ? WHERE id_espera = ?",
+                           (id_consulta, id_espera))
+            return id_consulta, id_espera
+
+    def cancelar_consulta(self, id_consulta):
+        """Deleta a consulta e oferece o horário ao melhor pedido da lista de espera.
+
+        A exclusão e o novo agendamento são feitos na mesma transação. Horários
+        que já passaram não são reaproveitados. Retorna (deletada, id_consulta_nova),
+        com id_consulta_nova None quando ninguém foi agendado.
+        """
+        agora = datetime.now().strftime("%Y-%m-%d %H:%M")
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute("""
+            SELECT c.id_medico, c.id_paciente, c.data_hora, m.especialidade
+            FROM consulta c JOIN medico m ON c.id_medico = m.id_medico
+            WHERE c.id_consulta = ?
+            """, (id_consulta,))
+            linha = cursor.fetchone()
+            if linha is None:
+                return False, None
+            id_medico, id_paciente, data_hora, especialidade = linha
+            if not deletar_consulta(self.conn, id_consulta, cursor=cursor, confirmar=False):
+                self.conn.rollback()
+                return False, None
+            agendado = None
+            if data_hora > agora:
+                agendado = self._preencher_horario(cursor, id_medico, especialidade, data_hora, id_paciente)
+            self.conn.commit()
+        except sqlite3.Error as e:
+            print(f"Erro ao cancelar consulta: {e}")
+            self.conn.rollback()
+            return False, None
+        finally:
+            cursor.close()
+        if agendado is None:
+            return True, None
+        id_consulta_nova, id_espera = agendado
+        self.pedidos.pop(id_espera, None) # Sai do heap quando chegar ao topo
+        print(f"Horário {data_hora} remarcado pela lista de espera (pedido {id_espera}).")
+        return True, id_consulta_nova
+
+# --- Objeto de acesso a dados ---
+
+class AgendaDAO:
+    """Acesso a dados com conexão própria (conectar_bd) e cursor reaproveitado entre as chamadas.
+
+    A conexão é aberta pelo DAO e fechada em fechar() (ou ao sair do bloco
+    `with`). O sqlite3 mantém as instruções já preparadas em cache por conexão
+    (até CACHED_STATEMENTS), então chamadas repetidas não recompilam o SQL.
+    Nas operações avulsas o custo é dominado pelo commit de cada uma, e o ganho
+    vem dos métodos em lote (adicionar_consultas_lote, deletar_consultas_lote),
+    que gravam tudo em uma transação.
+    """
+
+    def __init__(self, db_file=None):
+        self.conn = conectar_bd(db_file)
+        if self.conn is None:
+            raise sqlite3.OperationalError(f"Não foi possível abrir {db_file or DB_FILE}")
+        self.cursor = self.conn.cursor()
+
+    def fechar(self):
+        self.cursor.close()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        self.fechar()
+
+    # Médicos
+    def adicionar_medico(self, nome, especialidade):
+        return adicionar_medico(self.conn, nome, especialidade, cursor=self.cursor)
+
+    def listar_medicos(self):
+        return listar_medicos(self.conn, cursor=self.cursor)
+
+    def atualizar_medico(self, id_medico, nome, especialidade):
+        return atualizar_medico(self.conn, id_medico, nome, especialidade, cursor=self.cursor)
+
+    def deletar_medico(self, id_medico):
+        return deletar_medico(self.conn, id_medico, cursor=self.cursor)
+
+    # Pacientes
+    def adicionar_paciente(self, nome, data_nascimento, telefone):
+        return adicionar_paciente(self.conn, nome, data_nascimento, telefone, cursor=self.cursor)
+
+    def listar_pacientes(self):
+        return listar_pacientes(self.conn, cursor=self.cursor)
+
+    def atualizar_paciente(self, id_paciente, nome, data_nascimento, telefone):
+        return atualizar_paciente(self.conn, id_paciente, nome, data_nascimento, telefone, cursor=self.cursor)
+
+    def deletar_paciente(self, id_paciente):
+        return deletar_paciente(self.conn, id_paciente, cursor=self.cursor)
+
+    # Consultas
+    def adicionar_consulta(self, id_medico, id_paciente, data_hora, observacoes):
+        return adicionar_consulta(self.conn, id_medico, id_paciente, data_hora, observacoes, cursor=self.cursor)
+
+    def listar_consultas(self, formato="row"):
+        return listar_consultas(self.conn, cursor=self.cursor, formato=formato)
+
+    def obter_observacoes(self, id_consulta):
+        return obter_observacoes(self.conn, id_consulta, cursor=self.cursor)
+
+    def atualizar_consulta(self, id_consulta, id_medico, id_paciente, data_hora, observacoes):
+        return atualizar_consulta(self.conn, id_consulta, id_medico, id_paciente, data_hora, observacoes, cursor=self.cursor)
+
+    def deletar_consulta(self, id_consulta):
+        return deletar_consulta(self.conn, id_consulta, cursor=self.cursor)
+
+    def adicionar_consultas_lote(self, consultas):
+        return adicionar_consultas_lote(self.conn, consultas, cursor=self.cursor)
+
+    def deletar_consultas_lote(self, ids_consulta):
+        return deletar_consultas_lote(self.conn, ids_consulta, cursor=self.cursor)
 
 #############################
 # MÓDULO DE INTERFACE AJUDA #
@@ -283,11 +1201,38 @@ def mostrar_sobre():
         f"Integrantes: {integrantes}"
     )
 
+#############################
+# MÓDULO DE TELAS EM CACHE #
+#############################
+
+class TelaCacheavel:
+    """Base das telas mantidas em cache pelo App.
+
+    Cada tela informa, em carregadores(), a função que recarrega os dados de
+    cada tabela da qual depende. Ao ser exibida novamente, só são recarregadas
+    as tabelas alteradas desde a última carga (ver versao_dados).
+    """
+
+    def carregadores(self):
+        return {}
+
+    def marcar_carregada(self, *tabelas):
+        if not hasattr(self, "versoes_carregadas"):
+            self.versoes_carregadas = {}
+        for tabela in tabelas:
+            self.versoes_carregadas[tabela] = versao_dados[tabela]
+
+    def atualizar_se_necessario(self):
+        versoes = getattr(self, "versoes_carregadas", {})
+        for tabela, carregar in self.carregadores().items():
+            if versoes.get(tabela) != versao_dados[tabela]:
+                carregar()
+
 #############################
 # MÓDULO DE INTERFACE MÉDICO #
 #############################
 
-class TelaMedicos:
+class TelaMedicos(TelaCacheavel):
     def __init__(self, container, conn):
         self.container = container
         self.conn = conn
@@ -359,6 +1304,9 @@ class TelaMedicos:
         # Adicionar o frame principal ao container
         self.frame.pack(fill=tk.BOTH, expand=True)
 
+    def carregadores(self):
+        return {"medico": self.carregar_medicos}
+
     def carregar_medicos(self):
         # Limpar Treeview
         for i in self.tree.get_children():
@@ -367,6 +1315,7 @@ class TelaMedicos:
         medicos = listar_medicos(self.conn)
         for medico in medicos:
             self.tree.insert("", tk.END, values=(medico["id_medico"], medico["nome"], medico["especialidade"]))
+        self.marcar_carregada("medico")
 
     def adicionar_medico(self):
         nome = self.nome_entry.get()
@@ -443,18 +1392,11 @@ class TelaMedicos:
         self.especialidade_entry.delete(0, tk.END)
         self.especialidade_entry.insert(0, values[2])
 
-def abrir_tela_medicos(container, conn):
-    # Limpa o container antes de adicionar a nova tela
-    for widget in container.winfo_children():
-        widget.destroy()
-    # Cria a instância da tela
-    TelaMedicos(container, conn)
-
 ###############################
 # MÓDULO DE INTERFACE PACIENTE #
 ###############################
 
-class TelaPacientes:
+class TelaPacientes(TelaCacheavel):
     def __init__(self, container, conn):
         self.container = container
         self.conn = conn
@@ -533,6 +1475,9 @@ class TelaPacientes:
         # Adicionar o frame principal ao container
         self.frame.pack(fill=tk.BOTH, expand=True)
 
+    def carregadores(self):
+        return {"paciente": self.carregar_pacientes}
+
     def carregar_pacientes(self):
         # Limpar Treeview
         for i in self.tree.get_children():
@@ -541,6 +1486,7 @@ class TelaPacientes:
         pacientes = listar_pacientes(self.conn)
         for paciente in pacientes:
             self.tree.insert("", tk.END, values=(paciente["id_paciente"], paciente["nome"], paciente["data_nascimento"], paciente["telefone"]))
+        self.marcar_carregada("paciente")
 
     def adicionar_paciente(self):
         nome = self.nome_entry.get()
@@ -552,6 +1498,12 @@ class TelaPacientes:
             return
         # TODO: Adicionar validação para formato da data
 
+        id_existente = buscar_paciente_duplicado(self.conn, nome, telefone, data_nasc)
+        if id_existente is not None:
+            messagebox.showinfo("Paciente já cadastrado",
+                                f"Já existe um paciente com este nome, telefone e data de nascimento (ID {id_existente}).")
+            return
+
         if adicionar_paciente(self.conn, nome, data_nasc, telefone):
             messagebox.showinfo("Sucesso", "Paciente adicionado com sucesso!")
             self.limpar_campos()
@@ -625,18 +1577,11 @@ class TelaPacientes:
         self.telefone_entry.delete(0, tk.END)
         self.telefone_entry.insert(0, values[3])
 
-def abrir_tela_pacientes(container, conn):
-    # Limpa o container antes de adicionar a nova tela
-    for widget in container.winfo_children():
-        widget.destroy()
-    # Cria a instância da tela
-    TelaPacientes(container, conn)
-
 ###############################
 # MÓDULO DE INTERFACE CONSULTA #
 ###############################
 
-class TelaConsultas:
+class TelaConsultas(TelaCacheavel):
     def __init__(self, container, conn):
         self.container = container
         self.conn = conn
@@ -645,6 +1590,12 @@ class TelaConsultas:
         # Dicionários para mapear nomes para IDs (para Comboboxes)
         self.medicos_map = {}
         self.pacientes_map = {}
+        # ID da consulta -> (ID do médico, ID do paciente), preenchido em carregar_consultas
+        self.ids_consulta = {}
+        # ID do médico -> especialidade, para os pedidos da lista de espera
+        self.especialidades_medico = {}
+        # Horários liberados ao deletar uma consulta são oferecidos à lista de espera
+        self.lista_espera = ListaEspera(conn)
 
         # --- Widgets --- #
         # Frame para o formulário
@@ -686,24 +1637,25 @@ class TelaConsultas:
         self.clear_button = ttk.Button(button_frame, text="Limpar Campos", command=self.limpar_campos)
         self.clear_button.pack(side=tk.LEFT, padx=5)
 
+        self.espera_button = ttk.Button(button_frame, text="Lista de Espera", command=self.adicionar_lista_espera)
+        self.espera_button.pack(side=tk.LEFT, padx=5)
+
         # Frame para a Treeview
         tree_frame = ttk.Frame(self.frame)
         tree_frame.grid(row=2, column=0, padx=10, pady=10, sticky="nsew")
 
         # Configurar colunas da Treeview
-        self.tree = ttk.Treeview(tree_frame, columns=("ID", "Data/Hora", "Médico", "Paciente", "Obs"), show="headings")
+        self.tree = ttk.Treeview(tree_frame, columns=("ID", "Data/Hora", "Médico", "Paciente"), show="headings")
         self.tree.heading("ID", text="ID")
         self.tree.heading("Data/Hora", text="Data/Hora")
         self.tree.heading("Médico", text="Médico")
         self.tree.heading("Paciente", text="Paciente")
-        self.tree.heading("Obs", text="Observações")
 
         # Ajustar largura das colunas
         self.tree.column("ID", width=50, anchor=tk.CENTER)
         self.tree.column("Data/Hora", width=120, anchor=tk.CENTER)
-        self.tree.column("Médico", width=200)
-        self.tree.column("Paciente", width=200)
-        self.tree.column("Obs", width=200)
+        self.tree.column("Médico", width=300)
+        self.tree.column("Paciente", width=300)
 
         # Scrollbar
         scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.tree.yview)
@@ -727,39 +1679,52 @@ class TelaConsultas:
         # Adicionar o frame principal ao container
         self.frame.pack(fill=tk.BOTH, expand=True)
 
+    def carregadores(self):
+        return {
+            "medico": self.carregar_medicos_combobox,
+            "paciente": self.carregar_pacientes_combobox,
+            "consulta": self.carregar_consultas,
+        }
+
     def carregar_medicos_combobox(self):
         medicos = listar_medicos(self.conn)
         medico_nomes = []
         self.medicos_map.clear()
+        self.especialidades_medico.clear()
         for medico in medicos:
             nome_display = f"{medico['nome']} ({medico['especialidade']})" if medico['especialidade'] else medico['nome']
             self.medicos_map[nome_display] = medico['id_medico']
+            self.especialidades_medico[medico['id_medico']] = medico['especialidade']
             medico_nomes.append(nome_display)
         self.medico_combobox['values'] = medico_nomes
+        self.marcar_carregada("medico")
 
     def carregar_pacientes_combobox(self):
         pacientes = listar_pacientes(self.conn)
         paciente_nomes = []
         self.pacientes_map.clear()
+        # Homônimos recebem o ID no nome exibido, para não colidirem no map
+        contagem = {}
         for paciente in pacientes:
-            self.pacientes_map[paciente['nome']] = paciente['id_paciente']
-            paciente_nomes.append(paciente['nome'])
+            contagem[paciente['nome']] = contagem.get(paciente['nome'], 0) + 1
+        for paciente in pacientes:
+            nome_display = paciente['nome'] if contagem[paciente['nome']] == 1 else f"{paciente['nome']} (ID {paciente['id_paciente']})"
+            self.pacientes_map[nome_display] = paciente['id_paciente']
+            paciente_nomes.append(nome_display)
         self.paciente_combobox['values'] = paciente_nomes
+        self.marcar_carregada("paciente")
 
     def carregar_consultas(self):
         # Limpar Treeview
         for i in self.tree.get_children():
             self.tree.delete(i)
-        # Buscar dados no BD (com JOIN)
-        consultas = listar_consultas(self.conn)
+        # Buscar dados no BD (com JOIN), como tuplas simples:
+        # ID, Data/Hora, Médico, Paciente já estão na ordem das colunas
+        consultas = listar_consultas(self.conn, formato="tupla")
+        self.ids_consulta = {consulta[0]: consulta[4:6] for consulta in consultas}
         for consulta in consultas:
-            self.tree.insert("", tk.END, values=(
-                consulta["id_consulta"],
-                consulta["data_hora"],
-                consulta["nome_medico"],
-                consulta["nome_paciente"],
-                consulta["observacoes"]
-            ))
+            self.tree.insert("", tk.END, values=consulta[:4])
+        self.marcar_carregada("consulta")
 
     def validar_data_hora(self, data_hora_str):
         try:
@@ -792,10 +1757,8 @@ class TelaConsultas:
         if adicionar_consulta(self.conn, id_medico, id_paciente, data_hora, observacoes):
             messagebox.showinfo("Sucesso", "Consulta agendada com sucesso!")
             self.limpar_campos()
-            self.carregar_consultas()
-            # Recarregar comboboxes caso um médico/paciente tenha sido adicionado em outra tela
-            self.carregar_medicos_combobox()
-            self.carregar_pacientes_combobox()
+            # Recarrega a lista e, se mudaram em outra tela, os comboboxes
+            self.atualizar_se_necessario()
         else:
             messagebox.showerror("Erro", "Falha ao agendar consulta.")
 
@@ -830,9 +1793,7 @@ class TelaConsultas:
         if atualizar_consulta(self.conn, id_consulta, id_medico, id_paciente, data_hora, observacoes):
             messagebox.showinfo("Sucesso", "Consulta atualizada com sucesso!")
             self.limpar_campos()
-            self.carregar_consultas()
-            self.carregar_medicos_combobox()
-            self.carregar_pacientes_combobox()
+            self.atualizar_se_necessario()
         else:
             messagebox.showerror("Erro", "Falha ao atualizar consulta.")
 
@@ -848,13 +1809,45 @@ class TelaConsultas:
 
         confirm = messagebox.askyesno("Confirmar Deleção", f"Tem certeza que deseja deletar a consulta do dia {data_hora_consulta}?")
         if confirm:
-            if deletar_consulta(self.conn, id_consulta):
-                messagebox.showinfo("Sucesso", "Consulta deletada com sucesso!")
+            deletada, id_consulta_nova = self.lista_espera.cancelar_consulta(int(id_consulta))
+            if deletada:
+                if id_consulta_nova:
+                    messagebox.showinfo("Sucesso", "Consulta deletada com sucesso!\n"
+                                        f"O horário foi ocupado pela lista de espera (consulta ID {id_consulta_nova}).")
+                else:
+                    messagebox.showinfo("Sucesso", "Consulta deletada com sucesso!")
                 self.limpar_campos()
                 self.carregar_consultas()
             else:
                 messagebox.showerror("Erro", "Falha ao deletar consulta.")
 
+    def adicionar_lista_espera(self):
+        """Coloca o paciente selecionado na lista de espera do médico ou da especialidade dele."""
+        id_medico = self.medicos_map.get(self.medico_combobox.get())
+        id_paciente = self.pacientes_map.get(self.paciente_combobox.get())
+        if not id_medico or not id_paciente:
+            messagebox.showerror("Erro", "Selecione o Médico e o Paciente para a lista de espera.")
+            return
+
+        especialidade = self.especialidades_medico.get(id_medico)
+        apenas_medico = True
+        if especialidade:
+            apenas_medico = messagebox.askyesnocancel(
+                "Lista de Espera", f"Aguardar apenas por este médico?\n(Não: qualquer médico de {especialidade})")
+            if apenas_medico is None:
+                return
+        urgente = messagebox.askyesno("Lista de Espera", "O pedido é urgente?")
+        prioridade = PRIORIDADE_URGENTE if urgente else PRIORIDADE_NORMAL
+
+        if apenas_medico:
+            id_espera = self.lista_espera.adicionar(id_paciente, id_medico=id_medico, prioridade=prioridade)
+        else:
+            id_espera = self.lista_espera.adicionar(id_paciente, especialidade=especialidade, prioridade=prioridade)
+        if id_espera:
+            messagebox.showinfo("Sucesso", f"Paciente incluído na lista de espera ({len(self.lista_espera)} aguardando).")
+        else:
+            messagebox.showerror("Erro", "Falha ao incluir na lista de espera.")
+
     def limpar_campos(self):
         self.medico_combobox.set('')
         self.paciente_combobox.set('')
@@ -868,32 +1861,27 @@ class TelaConsultas:
             return
 
         item = selected_item[0]
-        values = self.tree.item(item, "values") # ID, Data/Hora, Médico Nome, Paciente Nome, Obs
-
-        # Buscar ID do médico e paciente correspondentes aos nomes
-        # Isso é necessário para setar corretamente os comboboxes
-        consulta_detalhes = None
-        consultas_raw = listar_consultas(self.conn) # Pega dados com IDs
-        for c in consultas_raw:
-            if c['id_consulta'] == int(values[0]):
-                consulta_detalhes = c
-                break
+        values = self.tree.item(item, "values") # ID, Data/Hora, Médico Nome, Paciente Nome
 
-        if not consulta_detalhes:
+        # IDs do médico e paciente, necessários para setar corretamente os comboboxes
+        id_consulta = int(values[0])
+        ids = self.ids_consulta.get(id_consulta)
+        if not ids:
             print("Erro: Não foi possível encontrar detalhes da consulta selecionada.")
             self.limpar_campos()
             return
+        id_medico, id_paciente = ids
 
         # Encontrar a chave correta nos maps para setar os comboboxes
         medico_key = None
         for key, val_id in self.medicos_map.items():
-            if val_id == consulta_detalhes['id_medico']:
+            if val_id == id_medico:
                 medico_key = key
                 break
 
         paciente_key = None
         for key, val_id in self.pacientes_map.items():
-            if val_id == consulta_detalhes['id_paciente']:
+            if val_id == id_paciente:
                 paciente_key = key
                 break
 
@@ -903,56 +1891,142 @@ class TelaConsultas:
         self.data_hora_entry.delete(0, tk.END)
         self.data_hora_entry.insert(0, values[1])
 
+        # As observações só são lidas (e descompactadas) ao selecionar a consulta
         self.obs_text.delete("1.0", tk.END)
-        self.obs_text.insert("1.0", values[4])
+        self.obs_text.insert("1.0", obter_observacoes(self.conn, id_consulta))
+
+#################################
+# MEDIÇÃO DO TEMPO DE INICIALIZAÇÃO #
+#################################
+
+# Etapas da inicialização -> segundos desde o início da importação do módulo
+tempos_inicio = {}
 
-def abrir_tela_consultas(container, conn):
-    # Limpa o container antes de adicionar a nova tela
-    for widget in container.winfo_children():
-        widget.destroy()
-    # Cria a instância da tela
-    TelaConsultas(container, conn)
+def registrar_tempo(etapa):
+    """Registra o instante em que uma etapa da inicialização terminou."""
+    tempos_inicio[etapa] = time.perf_counter() - _INICIO_PROCESSO
+
+def relatar_tempos_inicio():
+    """Imprime o relatório das etapas de inicialização registradas."""
+    print("Tempos de inicialização (desde a importação do módulo):")
+    anterior = 0.0
+    for etapa, instante in sorted(tempos_inicio.items(), key=lambda item: item[1]):
+        print(f"  {etapa:<25} {instante * 1000:8.1f} ms  (+{(instante - anterior) * 1000:.1f} ms)")
+        anterior = instante
+
+registrar_tempo("módulo importado")
 
 #############################
 # APLICAÇÃO PRINCIPAL #
 #############################
 
 class App(tk.Tk):
-    def __init__(self, conn):
+    def __init__(self, conn=None, medir_inicio=False, perfil=None):
+        """Cria a janela principal.
+
+        Sem `conn`, a janela é exibida imediatamente e o banco é aberto em
+        segundo plano; os menus de cadastro ficam desabilitados até lá.
+        Com `medir_inicio`, a aplicação imprime os tempos e fecha assim que o
+        banco estiver pronto (usado pelo benchmark de inicialização).
+        Com `perfil` (nome do arquivo de trace), ativa o modo de perfil da
+        interface (ver perfil_interface.py).
+        """
         super().__init__()
         self.conn = conn
+        self.medir_inicio = medir_inicio
         self.title("Agenda Médica")
         # Definir um tamanho mínimo e permitir redimensionamento
         self.minsize(800, 600)
         # Centralizar a janela (opcional, pode variar dependendo do SO/WM)
         # self.eval('tk::PlaceWindow . center')
 
+        # Mensagem de status exibida enquanto o banco de dados é aberto
+        self.status_label = ttk.Label(self, text="")
+        self.status_label.pack(side=tk.BOTTOM, fill=tk.X, padx=10, pady=(0, 5))
+
+        # Modo de perfil: importado só quando pedido, para não atrasar a inicialização
+        self.perfil = None
+        if perfil:
+            from perfil_interface import PerfilInterface
+            self.perfil = PerfilInterface(self, perfil)
+            self.perfil.instrumentar_modulo(sys.modules[__name__])
+
         # Container principal para as telas
         # Usar pack com fill e expand para ocupar o espaço disponível
         self.container = ttk.Frame(self)
         self.container.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
 
+        # Telas já construídas, por classe. Cada tela só é criada na primeira
+        # vez que é aberta; depois apenas é escondida e exibida novamente.
+        self.telas = {}
+        self.widget_atual = None
+
         # Cria a barra de menus
         self.criar_menu()
+        if self.perfil:
+            self.perfil.instrumentar(self.menubar)
 
         # Exibe uma tela inicial
         self.mostrar_tela_inicial()
+        registrar_tempo("janela criada")
+        self.after_idle(registrar_tempo, "primeira pintura")
+
+        if self.conn is None:
+            self.iniciar_bd_em_segundo_plano()
+
+    def iniciar_bd_em_segundo_plano(self):
+        """Abre e prepara o banco em outra thread, sem bloquear a janela."""
+        self.habilitar_menus(False)
+        self.status_label.config(text="Abrindo banco de dados...")
+        self.fila_bd = queue.Queue()
+
+        def abrir():
+            # A conexão é criada aqui e usada depois apenas pela thread da interface
+            self.fila_bd.put(inicializar_bd(check_same_thread=False))
+
+        threading.Thread(target=abrir, name="inicializar_bd", daemon=True).start()
+        self.after(20, self.verificar_bd)
+
+    def verificar_bd(self):
+        """Aguarda (sem bloquear o mainloop) o resultado da abertura do banco."""
+        try:
+            conn = self.fila_bd.get_nowait()
+        except queue.Empty:
+            self.after(20, self.verificar_bd)
+            return
+        registrar_tempo("banco de dados pronto")
+        if conn is None:
+            print("Erro: Não foi possível conectar ao banco de dados. A aplicação não pode iniciar.")
+            messagebox.showerror("Erro de Banco de Dados", "Não foi possível conectar ao banco de dados SQLite. Verifique o console para mais detalhes.")
+            self.destroy()
+            return
+        self.conn = conn
+        self.status_label.pack_forget()
+        self.habilitar_menus(True)
+        if self.medir_inicio:
+            relatar_tempos_inicio()
+            self.destroy()
+
+    def habilitar_menus(self, habilitar):
+        estado = tk.NORMAL if habilitar else tk.DISABLED
+        for label in ("Cadastros", "Agendamento"):
+            self.menubar.entryconfig(label, state=estado)
 
     def criar_menu(self):
         menubar = tk.Menu(self)
+        self.menubar = menubar
         self.config(menu=menubar)
 
         # Menu Cadastros
         menu_cadastros = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="Cadastros", menu=menu_cadastros)
-        # Usar as funções importadas dos módulos UI
-        menu_cadastros.add_command(label="Médicos", command=lambda: abrir_tela_medicos(self.container, self.conn))
-        menu_cadastros.add_command(label="Pacientes", command=lambda: abrir_tela_pacientes(self.container, self.conn))
+        menu_cadastros.add_command(label="Médicos", command=lambda: self.abrir_tela(TelaMedicos))
+        menu_cadastros.add_command(label="Pacientes", command=lambda: self.abrir_tela(TelaPacientes))
 
         # Menu Agendamento
         menu_agendamento = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="Agendamento", menu=menu_agendamento)
-        menu_agendamento.add_command(label="Consultas", command=lambda: abrir_tela_consultas(self.container, self.conn))
+        menu_agendamento.add_command(label="Consultas", command=lambda: self.abrir_tela(TelaConsultas))
 
         # Menu Ajuda
         menu_ajuda_menu = tk.Menu(menubar, tearoff=0) # Renomeado para evitar conflito
@@ -960,24 +2034,46 @@ class App(tk.Tk):
         # Usar a função importada do módulo ui_ajuda
         menu_ajuda_menu.add_command(label="Sobre", command=mostrar_sobre)
 
+    def abrir_tela(self, classe_tela):
+        """Exibe a tela pedida, construindo-a só na primeira vez que é aberta."""
+        tela = self.telas.get(classe_tela)
+        if tela is not None and tela.frame is self.widget_atual:
+            tela.atualizar_se_necessario()
+            return
+        if self.widget_atual is not None:
+            self.widget_atual.pack_forget()
+        if tela is None:
+            # O construtor já carrega os dados e adiciona o frame ao container
+            tela = classe_tela(self.container, self.conn)
+            self.telas[classe_tela] = tela
+            if self.perfil:
+                self.perfil.instrumentar(tela.frame)
+        else:
+            tela.atualizar_se_necessario()
+            tela.frame.pack(fill=tk.BOTH, expand=True)
+        self.widget_atual = tela.frame
+
     def mostrar_tela_inicial(self):
         """Mostra uma mensagem de boas-vindas no container."""
-        # Limpa o container antes de adicionar a nova tela
-        for widget in self.container.winfo_children():
-            widget.destroy()
         label = ttk.Label(self.container, text="Bem-vindo à Agenda Médica!\nUse o menu superior para navegar.", font=("Arial", 14), justify=tk.CENTER)
         # Usar pack com expand para centralizar melhor
         label.pack(padx=20, pady=50, expand=True)
+        self.widget_atual = label
 
 if __name__ == "__main__":
     print("Iniciando aplicação Agenda Médica...")
-    conexao = inicializar_bd()
-    if conexao:
-        app = App(conexao)
-        app.mainloop()
-        # Fecha a conexão com o BD ao sair da aplicação
-        conexao.close()
+    # --perfil [ARQUIVO.json] ativa o modo de perfil da interface
+    perfil = None
+    if "--perfil" in sys.argv:
+        posicao = sys.argv.index("--perfil") + 1
+        tem_arquivo = posicao < len(sys.argv) and not sys.argv[posicao].startswith("--")
+        perfil = sys.argv[posicao] if tem_arquivo else "agenda_perfil.json"
+    # A janela é exibida antes de o banco ser aberto (ver App.iniciar_bd_em_segundo_plano)
+    app = App(medir_inicio="--medir-inicio" in sys.argv, perfil=perfil)
+    app.mainloop()
+    if app.perfil:
+        app.perfil.salvar()
+    # Fecha a conexão com o BD ao sair da aplicação
+    if app.conn:
+        app.conn.close()
         print("Conexão com o banco de dados fechada.")
-    else:
-        print("Erro: Não foi possível conectar ao banco de dados. A aplicação não pode iniciar.")
-        messagebox.showerror("Erro de Banco de Dados", "Não foi possível conectar ao banco de dados SQLite. Verifique o console para mais detalhes.")
@@ -0,0 +1,325 @@
+"""Agendamento em lote dos pedidos da lista de espera da Agenda Médica.
+
+Lê os pedidos aguardando (lista_espera, com os horários preferidos de
+lista_espera_janela) e os horários livres dos médicos no período, e os
+distribui em duas etapas:
+1. guloso: por prioridade e ordem de chegada, cada pedido recebe o primeiro
+   horário livre dentro das suas janelas, em qualquer médico que o atenda;
+   sem horário na janela, recebe o primeiro horário livre do período;
+2. busca local: para cada pedido que ficou fora da janela (ou sem horário),
+   procura na janela dele um horário ocupado por outro pedido do lote que
+   possa ir para um horário livre também dentro da própria janela, e troca.
+Todas as consultas são gravadas em uma única transação.
+
+Horários que já passaram não são oferecidos, e as consultas já marcadas
+ocupam o médico e o paciente em todo horário da grade que se sobreponha a
+elas, mesmo as marcadas fora da grade (ex.: 10:15).
+
+Os horários de atendimento são uma grade fixa (dias úteis, de HORA_INICIO a
+HORA_FIM, a cada DURACAO_CONSULTA minutos), já que o cadastro de médicos
+não tem agenda de trabalho.
+
+Uso:
+    python agendamento_lote.py AAAA-MM-DD [--dias 7] [--simular] [--bd ARQUIVO]
+"""
+import argparse
+import bisect
+import sqlite3
+import time
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+from agenda_medica_unificada import DB_FILE, adicionar_consultas_lote, conectar_bd
+
+# Constantes
+HORA_INICIO = 8
+HORA_FIM = 18
+DURACAO_CONSULTA = 30 # Minutos
+FORMATO_DATA_HORA = "%Y-%m-%d %H:%M"
+TENTATIVAS_TROCA = 500 # Horários ocupados examinados por pedido na busca local
+
+Pedido = namedtuple("Pedido", ("id_espera", "id_paciente", "id_medico", "especialidade", "prioridade", "janelas"))
+
+def gerar_horarios(inicio, dias):
+    """Horários de atendimento dos dias úteis do período, como texto YYYY-MM-DD HH:MM, em ordem."""
+    horarios = []
+    for deslocamento in range(dias):
+        dia = inicio + timedelta(days=deslocamento)
+        if dia.weekday() >= 5: # Sábado e domingo
+            continue
+        instante = datetime(dia.year, dia.month, dia.day, HORA_INICIO)
+        fim = instante.replace(hour=HORA_FIM)
+        while instante < fim:
+            horarios.append(instante.strftime(FORMATO_DATA_HORA))
+            instante += timedelta(minutes=DURACAO_CONSULTA)
+    return horarios
+
+def carregar_pedidos(conn):
+    """Pedidos aguardando, em ordem de prioridade e chegada, com as janelas preferidas."""
+    janelas = {}
+    for id_espera, inicio, fim in conn.execute("""
+    SELECT j.id_espera, j.inicio, j.fim
+    FROM lista_espera_janela j JOIN lista_espera e ON e.id_espera = j.id_espera
+    WHERE e.situacao = 'aguardando'
+    ORDER BY j.id_espera, j.inicio
+    """):
+        janelas.setdefault(id_espera, []).append((inicio, fim))
+    return [Pedido(*linha, tuple(janelas.get(linha[0], ()))) for linha in conn.execute("""
+    SELECT id_espera, id_paciente, id_medico, especialidade, prioridade
+    FROM lista_espera WHERE situacao = 'aguardando'
+    ORDER BY prioridade, data_pedido, id_espera
+    """)]
+
+def _chave_especialidade(especialidade):
+    return (especialidade or "").strip().casefold()
+
+class AgendadorLote:
+    """Distribui os pedidos nos horários livres de um período (ver o docstring do módulo)."""
+
+    def __init__(self, conn, inicio, dias=7, pedidos=None, agora=None):
+        # Horários que já passaram não são oferecidos (como em ListaEspera.cancelar_consulta)
+        agora = (agora or datetime.now()).strftime(FORMATO_DATA_HORA)
+        self.horarios = [horario for horario in gerar_horarios(inicio, dias) if horario > agora]
+        self.pedidos = carregar_pedidos(conn) if pedidos is None else pedidos
+        duracao = timedelta(minutes=DURACAO_CONSULTA)
+        inicio_periodo = datetime(inicio.year, inicio.month, inicio.day)
+        fim_periodo = inicio_periodo + timedelta(days=dias)
+
+        # Horários livres de cada médico (listas ordenadas) e médicos por especialidade
+        self.livres = {}
+        self.medicos_especialidade = {}
+        for id_medico, especialidade in conn.execute("SELECT id_medico, especialidade FROM medico"):
+            self.livres[id_medico] = list(self.horarios)
+            self.medicos_especialidade.setdefault(_chave_especialidade(especialidade), []).append(id_medico)
+        # Consultas já marcadas ocupam o médico e o paciente em todos os horários
+        # da grade que se sobrepõem a elas, mesmo fora da grade (10:15 ocupa 10:00
+        # e 10:30). Cada consulta dura DURACAO_CONSULTA.
+        self.paciente_ocupado = {} # id_paciente -> horários da grade em que já tem consulta
+        ocupados = {}
+        for id_medico, id_paciente, data_hora in conn.execute(
+                "SELECT id_medico, id_paciente, data_hora FROM consulta WHERE data_hora > ? AND data_hora < ?",
+                ((inicio_periodo - duracao).strftime(FORMATO_DATA_HORA), fim_periodo.strftime(FORMATO_DATA_HORA))):
+            sobrepostos = self._sobrepostos(data_hora, duracao)
+            ocupados.setdefault(id_medico, set()).update(sobrepostos)
+            self.paciente_ocupado.setdefault(id_paciente, set()).update(sobrepostos)
+        for id_medico, horarios in ocupados.items():
+            if id_medico in self.livres:
+                self.livres[id_medico] = [horario for horario in self.livres[id_medico] if horario not in horarios]
+
+        self.atribuicao = {} # Índice do pedido -> (id_medico, horário)
+        self.ocupante = {} # (id_medico, horário) -> índice do pedido
+        self.trocas = 0
+
+    # --- Consultas à grade ---
+
+    def _sobrepostos(self, data_hora, duracao):
+        """Horários da grade cujo intervalo [h, h + duracao) cruza o de uma consulta em data_hora."""
+        try:
+            instante = datetime.strptime(data_hora, FORMATO_DATA_HORA)
+        except ValueError: # Fora do formato (ver verificacao_integridade.py): só o texto exato conta
+            return [data_hora]
+        primeiro = bisect.bisect_right(self.horarios, (instante - duracao).strftime(FORMATO_DATA_HORA))
+        ultimo = bisect.bisect_left(self.horarios, (instante + duracao).strftime(FORMATO_DATA_HORA))
+        return self.horarios[primeiro:ultimo]
+
+    def _candidatos(self, pedido):
+        if pedido.id_medico is not None:
+            return [pedido.id_medico] if pedido.id_medico in self.livres else []
+        return self.medicos_especialidade.get(_chave_especialidade(pedido.especialidade), [])
+
+    def na_janela(self, pedido, horario):
+        return not pedido.janelas or any(inicio <= horario < fim for inicio, fim in pedido.janelas)
+
+    def _livre_na_janela(self, pedido):
+        """(horário, id_medico) livre mais cedo dentro das janelas do pedido, ou None."""
+        ocupado = self.paciente_ocupado.get(pedido.id_paciente, ())
+        janelas = pedido.janelas or (("", "9999"),) # Sem preferência: o período inteiro
+        melhor = None
+        for id_medico in self._candidatos(pedido):
+            livres = self.livres[id_medico]
+            for inicio, fim in janelas:
+                posicao = bisect.bisect_left(livres, inicio)
+                while posicao < len(livres) and livres[posicao] < fim:
+                    horario = livres[posicao]
+                    if horario not in ocupado:
+                        if melhor is None or horario < melhor[0]:
+                            melhor = (horario, id_medico)
+                        break
+                    posicao += 1
+        return melhor
+
+    def _livre_qualquer(self, pedido):
+        """(horário, id_medico) livre mais cedo no período, fora das preferências se preciso."""
+        ocupado = self.paciente_ocupado.get(pedido.id_paciente, ())
+        melhor = None
+        for id_medico in self._candidatos(pedido):
+            for horario in self.livres[id_medico]:
+                if horario not in ocupado:
+                    if melhor is None or horario < melhor[0]:
+                        melhor = (horario, id_medico)
+                    break
+        return melhor
+
+    def _ocupar(self, indice, id_medico, horario):
+        livres = self.livres[id_medico]
+        del livres[bisect.bisect_left(livres, horario)]
+        self.atribuicao[indice] = (id_medico, horario)
+        self.ocupante[(id_medico, horario)] = indice
+        self.paciente_ocupado.setdefault(self.pedidos[indice].id_paciente, set()).add(horario)
+
+    def _liberar(self, indice):
+        id_medico, horario = self.atribuicao.pop(indice)
+        bisect.insort(self.livres[id_medico], horario)
+        del self.ocupante[(id_medico, horario)]
+        self.paciente_ocupado[self.pedidos[indice].id_paciente].discard(horario)
+
+    # --- Etapas ---
+
+    def guloso(self):
+        for indice, pedido in enumerate(self.pedidos):
+            escolha = self._livre_na_janela(pedido) or self._livre_qualquer(pedido)
+            if escolha:
+                self._ocupar(indice, escolha[1], escolha[0])
+
+    def _trocar(self, indice):
+        """Tenta colocar o pedido na janela dele deslocando outro pedido do lote. Retorna True se conseguiu."""
+        pedido = self.pedidos[indice]
+        ocupado = self.paciente_ocupado.get(pedido.id_paciente, ())
+        tentativas = 0
+        for id_medico in self._candidatos(pedido):
+            for inicio, fim in pedido.janelas:
+                posicao = bisect.bisect_left(self.horarios, inicio)
+                while posicao < len(self.horarios) and self.horarios[posicao] < fim:
+                    horario = self.horarios[posicao]
+                    posicao += 1
+                    outro = self.ocupante.get((id_medico, horario))
+                    if outro is None or horario in ocupado or outro in self.sem_alternativa:
+                        continue
+                    tentativas += 1
+                    if tentativas > TENTATIVAS_TROCA:
+                        return False
+                    destino = self._livre_na_janela(self.pedidos[outro])
+                    if destino is None:
+                        self.sem_alternativa.add(outro)
+                        continue
+                    self._liberar(outro)
+                    self._ocupar(outro, destino[1], destino[0])
+                    if indice in self.atribuicao:
+                        self._liberar(indice)
+                    self._ocupar(indice, id_medico, horario)
+                    self.trocas += 1
+                    # Um horário foi liberado: quem não tinha alternativa pode ter agora
+                    self.sem_alternativa.clear()
+                    return True
+        return False
+
+    def busca_local(self):
+        self.sem_alternativa = set() # Pedidos que não têm outro horário livre na janela
+        for indice, pedido in enumerate(self.pedidos):
+            if not pedido.janelas:
+                continue
+            atual = self.atribuicao.get(indice)
+            if atual is None or not self.na_janela(pedido, atual[1]):
+                self._trocar(indice)
+        # Horários liberados pelas trocas ainda servem aos pedidos que ficaram sem nenhum
+        for indice, pedido in enumerate(self.pedidos):
+            if indice not in self.atribuicao:
+                escolha = self._livre_qualquer(pedido)
+                if escolha:
+                    self._ocupar(indice, escolha[1], escolha[0])
+
+    def resolver(self, busca_local=True):
+        """Executa as etapas e retorna o relatório (ver relatorio)."""
+        inicio = time.perf_counter()
+        self.guloso()
+        self.tempo_guloso = time.perf_counter() - inicio
+        self.satisfeitos_guloso = self._satisfeitos()
+        if busca_local:
+            self.busca_local()
+        self.tempo_total = time.perf_counter() - inicio
+        return self.relatorio()
+
+    def _satisfeitos(self):
+        return sum(1 for indice, (_, horario) in self.atribuicao.items()
+                   if self.pedidos[indice].janelas and self.na_janela(self.pedidos[indice], horario))
+
+    def relatorio(self):
+        com_preferencia = sum(1 for pedido in self.pedidos if pedido.janelas)
+        satisfeitos = self._satisfeitos()
+        return {
+            "pedidos": len(self.pedidos),
+            "agendados": len(self.atribuicao),
+            "sem_horario": len(self.pedidos) - len(self.atribuicao),
+            "com_preferencia": com_preferencia,
+            "na_janela": satisfeitos,
+            "satisfacao": satisfeitos / com_preferencia if com_preferencia else 1.0,
+            "satisfacao_guloso": self.satisfeitos_guloso / com_preferencia if com_preferencia else 1.0,
+            "trocas": self.trocas,
+            "tempo_guloso": self.tempo_guloso,
+            "tempo_total": self.tempo_total,
+        }
+
+    # --- Gravação ---
+
+    def gravar(self, conn):
+        """Grava as consultas (por adicionar_consultas_lote) e marca os pedidos como agendados, tudo em uma transação.
+
+        Retorna o número de consultas gravadas (0 se a transação falhar).
+        """
+        atribuicoes = sorted(self.atribuicao.items())
+        ids_espera = [self.pedidos[indice].id_espera for indice, _ in atribuicoes]
+        cursor = conn.cursor()
+        try:
+            ids_consulta = adicionar_consultas_lote(
+                conn, [(id_medico, self.pedidos[indice].id_paciente, horario,
+                        f"Agendada em lote (pedido {self.pedidos[indice].id_espera}).")
+                       for indice, (id_medico, horario) in atribuicoes],
+                cursor=cursor, confirmar=False, retornar_ids=True)
+            if ids_consulta is None:
+                conn.rollback()
+                return 0
+            cursor.executemany("UPDATE lista_espera SET situacao = 'agendado', id_consulta = ? WHERE id_espera = ?",
+                               zip(ids_consulta, ids_espera))
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Erro ao gravar o agendamento em lote: {e}")
+            conn.rollback()
+            return 0
+        finally:
+            cursor.close()
+        return len(ids_consulta)
+
+def imprimir_relatorio(relatorio):
+    print(f"Pedidos: {relatorio['pedidos']} | agendados: {relatorio['agendados']} | "
+          f"sem horário: {relatorio['sem_horario']}")
+    print(f"Dentro da janela preferida: {relatorio['na_janela']} de {relatorio['com_preferencia']} "
+          f"({relatorio['satisfacao']:.1%}; só o guloso: {relatorio['satisfacao_guloso']:.1%}, "
+          f"{relatorio['trocas']} trocas)")
+    print(f"Tempo: {relatorio['tempo_total'] * 1000:.0f} ms (guloso: {relatorio['tempo_guloso'] * 1000:.0f} ms)")
+
+#############################
+# LINHA DE COMANDO #
+#############################
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Agenda em lote os pedidos da lista de espera.")
+    parser.add_argument("inicio", type=date.fromisoformat, help="primeiro dia do período (AAAA-MM-DD)")
+    parser.add_argument("--dias", type=int, default=7)
+    parser.add_argument("--bd", default=None, help=f"arquivo do banco (padrão: {DB_FILE})")
+    parser.add_argument("--simular", action="store_true", help="mostra o resultado sem gravar")
+    args = parser.parse_args(argv)
+
+    conn = conectar_bd(args.bd)
+    if conn is None:
+        return 1
+    try:
+        agendador = AgendadorLote(conn, args.inicio, args.dias)
+        imprimir_relatorio(agendador.resolver())
+        if not args.simular:
+            agendador.gravar(conn)
+        return 0
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,446 @@
+"""Benchmarks da Agenda Médica.
+
+Uso:
+    python benchmark_agenda.py            # executa todos
+    python benchmark_agenda.py crud       # executa apenas os benchmarks indicados
+
+Cada benchmark cria um banco temporário, então o agenda_medica.db real não é tocado.
+"""
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import agenda_medica_unificada as agenda
+
+#############################
+# FUNÇÕES AUXILIARES #
+#############################
+
+@contextlib.contextmanager
+def bd_temporario():
+    """Cria um banco de dados vazio em um diretório temporário e retorna a conexão."""
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminho = os.path.join(diretorio, "benchmark.db")
+        with contextlib.redirect_stdout(io.StringIO()):
+            conn = agenda.inicializar_bd(caminho)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+def popular_bd(conn, n_medicos=20, n_pacientes=200, n_consultas=0):
+    """Insere dados sintéticos para os benchmarks."""
+    conn.executemany("INSERT INTO medico(nome, especialidade) VALUES(?,?)",
+                     ((f"Médico {i}", f"Especialidade {i % 5}") for i in range(n_medicos)))
+    conn.executemany("INSERT INTO paciente(nome, data_nascimento, telefone) VALUES(?,?,?)",
+                     ((f"Paciente {i}", "1990-01-01", f"(11) 9{i:08d}") for i in range(n_pacientes)))
+    conn.executemany("INSERT INTO consulta(id_medico, id_paciente, data_hora) VALUES(?,?,?)",
+                     ((i % n_medicos + 1, i % n_pacientes + 1,
+                       f"2025-{i % 12 + 1:02d}-{i % 28 + 1:02d} {8 + i % 10:02d}:{(i * 30) % 60:02d}")
+                      for i in range(n_consultas)))
+    conn.commit()
+
+def medir(func, *args, **kwargs):
+    """Executa func silenciando o console e retorna (resultado, segundos)."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        inicio = time.perf_counter()
+        resultado = func(*args, **kwargs)
+        return resultado, time.perf_counter() - inicio
+
+def relatar(nome, segundos, n):
+    print(f"  {nome:<40} {segundos * 1000:9.1f} ms  {n / segundos:12.0f} ops/s")
+
+#############################
+# BENCHMARKS #
+#############################
+
+def bench_crud(n=2000):
+    """Compara as funções CRUD (um cursor por chamada) com o AgendaDAO e os lotes."""
+    print(f"CRUD de consultas ({n} operações)")
+    with bd_temporario() as conn:
+        popular_bd(conn)
+        consultas = [(i % 20 + 1, i % 200 + 1, f"2025-06-{i % 28 + 1:02d} 10:00", "") for i in range(n)]
+
+        def funcoes():
+            ids = [agenda.adicionar_consulta(conn, *c) for c in consultas]
+            for id_consulta in ids:
+                agenda.deletar_consulta(conn, id_consulta)
+
+        caminho = conn.execute("PRAGMA database_list").fetchone()[2]
+
+        def dao():
+            with agenda.AgendaDAO(caminho) as acesso:
+                ids = [acesso.adicionar_consulta(*c) for c in consultas]
+                for id_consulta in ids:
+                    acesso.deletar_consulta(id_consulta)
+
+        def lote():
+            with agenda.AgendaDAO(caminho) as acesso:
+                acesso.adicionar_consultas_lote(consultas)
+                ids = [linha[0] for linha in acesso.conn.execute("SELECT id_consulta FROM consulta")]
+                acesso.deletar_consultas_lote(ids)
+
+        for nome, func in (("funções (cursor por chamada)", funcoes),
+                           ("AgendaDAO (conexão e cursor próprios)", dao),
+                           ("AgendaDAO em lote", lote)):
+            _, segundos = medir(func)
+            relatar(nome, segundos, 2 * n)
+
+def bench_linhas(n=200000):
+    """Compara memória e tempo de listar_consultas com sqlite3.Row e os formatos compactos."""
+    print(f"Formatos de linha em listar_consultas ({n} consultas)")
+    with bd_temporario() as conn:
+        popular_bd(conn, n_consultas=n)
+
+        def colunas():
+            return list(agenda.listar_consultas_colunas(conn))
+
+        for nome, func in (("sqlite3.Row", lambda: agenda.listar_consultas(conn)),
+                           ("ConsultaLinha (namedtuple)", lambda: agenda.listar_consultas(conn, formato="nomeada")),
+                           ("tupla", lambda: agenda.listar_consultas(conn, formato="tupla")),
+                           ("lotes colunares", colunas)):
+            tracemalloc.start()
+            resultado, segundos = medir(func)
+            memoria_retida, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            del resultado
+            _, segundos = medir(func) # Tempo medido sem o custo do tracemalloc
+            relatar(nome, segundos, n)
+            print(f"  {'':<40} {memoria_retida / 2**20:9.1f} MiB retidos")
+
+def bench_inicio(n_importacoes=10):
+    """Detalha o tempo de importação (-X importtime) e, havendo display, as etapas de abertura da janela."""
+    print("Inicialização da aplicação")
+    diretorio_repo = os.path.dirname(os.path.abspath(__file__))
+    saida = subprocess.run([sys.executable, "-X", "importtime", "-c", "import agenda_medica_unificada"],
+                           cwd=diretorio_repo, capture_output=True, text=True).stderr
+    importacoes = []
+    for linha in saida.splitlines():
+        if not linha.startswith("import time:") or "cumulative" in linha:
+            continue
+        proprio, acumulado, nome = linha[len("import time:"):].split("|")
+        importacoes.append((int(acumulado), int(proprio), nome.rstrip()))
+    print(f"  Importações mais lentas (de {len(importacoes)}):")
+    for acumulado, proprio, nome in sorted(importacoes, reverse=True)[:n_importacoes]:
+        print(f"    {nome:<40} {acumulado / 1000:8.1f} ms acumulado  {proprio / 1000:8.1f} ms próprio")
+
+    # A janela precisa de um display; o banco é criado no diretório temporário
+    with tempfile.TemporaryDirectory() as diretorio:
+        resultado = subprocess.run([sys.executable, os.path.join(diretorio_repo, "agenda_medica_unificada.py"), "--medir-inicio"],
+                                   cwd=diretorio, capture_output=True, text=True, timeout=60)
+    if resultado.returncode != 0:
+        print("  Etapas da janela não medidas (sem display disponível?):")
+        print("    " + (resultado.stderr.strip().splitlines() or ["erro desconhecido"])[-1])
+        return
+    for linha in resultado.stdout.splitlines():
+        if linha.startswith("  "):
+            print("  " + linha)
+
+def bench_observacoes(n=50000, tamanho_obs=1500):
+    """Compara a listagem com as observações inline (esquema antigo) e na tabela compactada."""
+    print(f"Observações fora da listagem ({n} consultas, ~{tamanho_obs} caracteres cada)")
+    frases = ("Paciente relata dor lombar há três semanas. ", "Pressão arterial 12x8. ",
+              "Solicitados exames de sangue e raio-x. ", "Retorno em 30 dias. ")
+    with bd_temporario() as conn:
+        popular_bd(conn, n_consultas=n)
+        # Esquema antigo: texto gravado direto na coluna consulta.observacoes, e
+        # user_version 0 para que migrar_bd mova as observações (criar_tabelas já marca 1)
+        texto = "".join(frases[i % len(frases)] for i in range(tamanho_obs // 30))
+        conn.execute("UPDATE consulta SET observacoes = ? || id_consulta", (texto,))
+        conn.execute("PRAGMA user_version = 0")
+        conn.commit()
+        sql_antigo = agenda.SQL_LISTAR_CONSULTAS.replace("c.id_medico,", "c.observacoes, c.id_medico,", 1)
+        caminho = conn.execute("PRAGMA database_list").fetchone()[2]
+
+        def medir_listagem(nome, func):
+            tracemalloc.start()
+            linhas, _ = medir(func)
+            memoria, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            del linhas
+            _, segundos = medir(func)
+            relatar(nome, segundos, n)
+            print(f"  {'':<40} {memoria / 2**20:9.1f} MiB retidos")
+
+        def tamanhos():
+            conn.execute("VACUUM")
+            paginas_consulta = conn.execute("SELECT SUM(pgsize) FROM dbstat WHERE name = 'consulta'").fetchone()[0]
+            return os.path.getsize(caminho), paginas_consulta
+
+        arquivo, tabela = tamanhos()
+        print(f"  Esquema antigo: arquivo {arquivo / 2**20:.1f} MiB, tabela consulta {tabela / 2**20:.1f} MiB")
+        medir_listagem("listagem com observações", lambda: conn.execute(sql_antigo).fetchall())
+
+        medir(agenda.migrar_bd, conn)
+        movidas = conn.execute("SELECT COUNT(*) FROM consulta_observacao").fetchone()[0]
+        inline = conn.execute("SELECT COUNT(*) FROM consulta WHERE observacoes IS NOT NULL").fetchone()[0]
+        assert movidas == n and inline == 0, f"migrar_bd moveu {movidas} de {n} observações ({inline} ainda inline)"
+        arquivo, tabela = tamanhos()
+        print(f"  Tabela compactada: arquivo {arquivo / 2**20:.1f} MiB, tabela consulta {tabela / 2**20:.1f} MiB")
+        medir_listagem("listar_consultas (colunas estreitas)", lambda: agenda.listar_consultas(conn, formato="tupla"))
+        _, segundos = medir(lambda: [agenda.obter_observacoes(conn, i) for i in range(1, 1001)])
+        relatar("obter_observacoes (ao selecionar)", segundos, 1000)
+
+def bench_deduplicacao(n=200000, fracao_duplicados=0.2):
+    """Mede o job de deduplicação com pacientes duplicados em formatos diferentes."""
+    import deduplicacao_pacientes
+    print(f"Deduplicação de pacientes ({n} pacientes, {fracao_duplicados:.0%} duplicados)")
+    nomes = ("Maria", "José", "Ana", "João", "Felipe", "Luiza", "Cecília", "Rafael", "Beatriz", "Guilherme")
+    sobrenomes = ("Silva", "Souza", "Pereira", "Oliveira", "Costa", "Queiroz", "Rodrigues", "Almeida")
+    variantes = {"José": "JOSE", "João": "Joao", "Cecília": "cecilia", "Luiza": "LUIZA"}
+    n_originais = int(n * (1 - fracao_duplicados))
+    pacientes = []
+    for i in range(n):
+        original = i if i < n_originais else (i * 7919) % n_originais
+        nome = f"{nomes[original % 10]} {sobrenomes[original // 10 % 8]} {sobrenomes[original // 80 % 8]}"
+        nascimento = f"{1940 + original % 70}-{original // 70 % 12 + 1:02d}-{original // 840 % 28 + 1:02d}"
+        telefone = f"(11) 9{original:08d}"
+        if i >= n_originais: # Duplicado: acentos, maiúsculas, espaços e formato de telefone diferentes
+            nome = "  ".join(variantes.get(parte, parte) for parte in nome.split())
+            telefone = f"+55 11 9{original:08d}"
+        pacientes.append((nome, nascimento, telefone))
+    with bd_temporario() as conn:
+        popular_bd(conn, n_pacientes=0)
+        medir(lambda: [agenda.adicionar_paciente(conn, *p) for p in pacientes[:1000]])
+        # Carga em massa sem a verificação do adicionar_paciente (simula um banco antigo)
+        conn.executemany("INSERT INTO paciente(nome, data_nascimento, telefone) VALUES(?,?,?)", pacientes[1000:])
+        conn.executemany("INSERT INTO consulta(id_medico, id_paciente, data_hora) VALUES(?,?,?)",
+                         ((i % 20 + 1, i + 1, "2025-06-01 10:00") for i in range(0, n, 3)))
+        conn.commit()
+        _, segundos = medir(agenda.migrar_bd, conn)
+        relatar("migrar_bd (normalização em massa)", segundos, n)
+        removidos, segundos = medir(deduplicacao_pacientes.deduplicar, conn)
+        relatar("deduplicar", segundos, n)
+        restantes = conn.execute("SELECT COUNT(*) FROM paciente").fetchone()[0]
+        orfas = conn.execute("SELECT COUNT(*) FROM consulta c LEFT JOIN paciente p USING (id_paciente) "
+                             "WHERE p.id_paciente IS NULL").fetchone()[0]
+        print(f"  {removidos} duplicados unidos, {restantes} pacientes restantes "
+              f"(esperado {n_originais}), {orfas} consultas órfãs")
+
+def bench_lista_espera(n_pedidos=100000, n_cancelamentos=5000):
+    """Mede o cancelamento com reaproveitamento do horário pela lista de espera."""
+    print(f"Lista de espera ({n_pedidos} pedidos, {n_cancelamentos} cancelamentos)")
+    with bd_temporario() as conn:
+        popular_bd(conn, n_pacientes=2000)
+        # Metade dos pedidos aguarda um médico, metade qualquer médico da especialidade
+        conn.executemany("INSERT INTO lista_espera(id_paciente, id_medico, especialidade, prioridade, data_pedido) "
+                         "VALUES(?,?,?,?,?)",
+                         ((i % 2000 + 1, i % 20 + 1 if i % 2 else None, f"Especialidade {i % 5}",
+                           1 + i % 5, f"2025-01-01 {i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}")
+                          for i in range(n_pedidos)))
+        conn.executemany("INSERT INTO consulta(id_medico, id_paciente, data_hora) VALUES(?,?,?)",
+                         ((i % 20 + 1, i % 2000 + 1, f"2099-{i % 12 + 1:02d}-{i % 28 + 1:02d} {8 + i % 10:02d}:00")
+                          for i in range(n_cancelamentos)))
+        conn.commit()
+        ids = [linha[0] for linha in conn.execute("SELECT id_consulta FROM consulta")]
+        lista, segundos = medir(agenda.ListaEspera, conn)
+        relatar("carregar heaps", segundos, n_pedidos)
+        resultados, segundos = medir(lambda: [lista.cancelar_consulta(id_consulta) for id_consulta in ids])
+        relatar("cancelar_consulta + reagendamento", segundos, n_cancelamentos)
+        remarcadas = sum(1 for _, id_nova in resultados if id_nova)
+        print(f"  {remarcadas} horários reaproveitados, {len(lista)} pedidos aguardando, "
+              f"{n_cancelamentos / segundos * 3600:.0f} cancelamentos/hora")
+
+def bench_lembretes(n=500000, dias=730):
+    """Mede a varredura por faixa de data e o envio dos lembretes com o remetente em arquivo."""
+    import lembretes_consulta
+    from datetime import datetime, timedelta
+    print(f"Lembretes de consulta ({n} consultas em {dias} dias)")
+    agora = datetime.now()
+    with bd_temporario() as conn:
+        popular_bd(conn)
+        passo = dias * 24 * 60 / n # Minutos entre consultas consecutivas
+        conn.executemany("INSERT INTO consulta(id_medico, id_paciente, data_hora) VALUES(?,?,?)",
+                         ((i % 20 + 1, i % 200 + 1, (agora + timedelta(minutes=i * passo)).strftime("%Y-%m-%d %H:%M"))
+                          for i in range(n)))
+        conn.commit()
+        db_file = conn.execute("PRAGMA database_list").fetchone()[2]
+        _, segundos = medir(lambda: conn.execute("SELECT COUNT(*) FROM consulta WHERE data_hora > ?",
+                                                 (agora.strftime("%Y-%m-%d %H:%M"),)).fetchone())
+        print(f"  {'contagem das consultas futuras (referência)':<40} {segundos * 1000:9.1f} ms")
+        remetente = lembretes_consulta.RemetenteArquivo(os.devnull)
+        servico = lembretes_consulta.ServicoLembretes(remetente, db_file)
+        novos, segundos = medir(servico.varrer, agora)
+        relatar("varredura (próximas 24h)", segundos, novos)
+        # Todos os lembretes de 24h do dia seguinte já venceram um dia depois
+        enviados, segundos = medir(servico.executar_uma_vez, agora + timedelta(days=1))
+        relatar("envio (4 trabalhadores)", segundos, enviados)
+        servico.parar()
+        servico = lembretes_consulta.ServicoLembretes(remetente, db_file)
+        novos, segundos = medir(servico.varrer, agora + timedelta(days=1))
+        print(f"  {'varredura após reinício':<40} {segundos * 1000:9.1f} ms")
+        print(f"  {enviados} lembretes enviados; após o reinício, {novos} novos (os já enviados não se repetem)")
+        servico.parar()
+        remetente.fechar()
+
+def bench_cache(n=200000, n_requisicoes=5000, fracao_escritas=0.02):
+    """Compara as agendas do dia/semana com e sem o cache, com escritas intercaladas."""
+    import random
+    from datetime import date, timedelta
+    print(f"Cache de agendas ({n} consultas, {n_requisicoes} requisições, {fracao_escritas:.0%} escritas)")
+    with bd_temporario() as conn:
+        popular_bd(conn, n_consultas=n)
+        sorteio = random.Random(42)
+        dias = [date(2025, 6, 2) + timedelta(days=i) for i in range(5)]
+        requisicoes = []
+        for _ in range(n_requisicoes):
+            dia = sorteio.choice(dias)
+            if sorteio.random() < fracao_escritas:
+                requisicoes.append(("escrita", sorteio.randint(1, 20), f"{dia} {sorteio.randint(8, 17):02d}:00"))
+            elif sorteio.random() < 0.7:
+                requisicoes.append(("dia", sorteio.randint(1, 20), dia))
+            else:
+                requisicoes.append(("semana", f"Especialidade {sorteio.randint(0, 4)}", dia))
+
+        def executar():
+            for tipo, filtro, valor in requisicoes:
+                if tipo == "escrita":
+                    agenda.adicionar_consulta(conn, filtro, 1, valor, "")
+                elif tipo == "dia":
+                    agenda.agenda_do_dia(conn, filtro, valor)
+                else:
+                    agenda.agenda_da_semana(conn, filtro, valor)
+
+        _, segundos = medir(executar)
+        relatar("sem cache", segundos, n_requisicoes)
+        cache = agenda.ativar_cache_consultas(conn)
+        _, segundos = medir(executar)
+        relatar("com cache", segundos, n_requisicoes)
+        estatisticas = cache.estatisticas()
+        agenda.desativar_cache_consultas(conn)
+        print(f"  {estatisticas['taxa_acerto']:.1%} de acertos, {estatisticas['invalidadas']} entradas invalidadas, "
+              f"{estatisticas['entradas']} em cache ({estatisticas['bytes'] / 1024:.0f} KiB)")
+
+def _gravar_consultas(caminho, n):
+    """Processo escritor do bench_clinicas: n agendamentos, cada um na sua transação."""
+    conn = agenda.conectar_bd(caminho)
+    conn.execute("PRAGMA busy_timeout = 60000") # Escritores do mesmo arquivo esperam a vez
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(n):
+            agenda.adicionar_consulta(conn, i % 20 + 1, i % 200 + 1, f"2031-01-{i % 28 + 1:02d} {8 + i % 10:02d}:00", "")
+    conn.close()
+
+def bench_clinicas(n_escritores=8, n_agendamentos=200, clinicas=(1, 2, 4, 8), n_consultas=200000, repeticoes=20):
+    """Mede escritas concorrentes e buscas na rede conforme o número de bancos de clínica."""
+    import clinicas_bd
+    from concurrent.futures import ProcessPoolExecutor
+    print(f"Bancos por clínica ({n_escritores} escritores x {n_agendamentos} agendamentos, "
+          f"{n_consultas} consultas na rede)")
+    for n_clinicas in clinicas:
+        with tempfile.TemporaryDirectory() as diretorio:
+            with contextlib.redirect_stdout(io.StringIO()), clinicas_bd.RoteadorClinicas(diretorio) as roteador:
+                for id_clinica in range(1, n_clinicas + 1):
+                    popular_bd(roteador.criar_clinica(id_clinica), n_consultas=n_consultas // n_clinicas)
+            # Cada escritor grava na clínica dele; com menos bancos, vários dividem o mesmo arquivo
+            caminhos = [roteador.caminho(escritor % n_clinicas + 1) for escritor in range(n_escritores)]
+            with ProcessPoolExecutor(max_workers=n_escritores) as executor:
+                _, segundos = medir(lambda: list(executor.map(_gravar_consultas, caminhos,
+                                                              [n_agendamentos] * n_escritores)))
+            relatar(f"{n_clinicas} banco(s): escritas concorrentes", segundos, n_escritores * n_agendamentos)
+            with clinicas_bd.RoteadorClinicas(diretorio) as roteador:
+                for modo in clinicas_bd.MODOS_REDE:
+                    roteador.medicos_livres("Especialidade 1", "2025-06-02 10:00", modo) # Aquece o pool
+                    _, segundos = medir(lambda: [roteador.medicos_livres("Especialidade 1", "2025-06-02 10:00", modo)
+                                                 for _ in range(repeticoes)])
+                    relatar(f"{n_clinicas} banco(s): médicos livres ({modo})", segundos, repeticoes)
+                _, segundos = medir(roteador.consultas_periodo, "2025-06-01", "2025-07-01")
+                relatar(f"{n_clinicas} banco(s): consultas de um mês (anexar)", segundos, 1)
+
+def bench_agendamento(n_pedidos=10000, n_medicos=120, n_pacientes=8000):
+    """Mede o agendamento em lote da lista de espera, com as manhãs mais disputadas."""
+    import agendamento_lote
+    import random
+    from datetime import date, datetime
+    print(f"Agendamento em lote ({n_pedidos} pedidos, {n_medicos} médicos, 5 dias úteis)")
+    sorteio = random.Random(39)
+    dias = ["2025-03-03", "2025-03-04", "2025-03-05", "2025-03-06", "2025-03-07"]
+    with bd_temporario() as conn:
+        popular_bd(conn, n_medicos=n_medicos, n_pacientes=n_pacientes)
+        # Metade dos pedidos aguarda um médico, metade qualquer médico da especialidade
+        conn.executemany("INSERT INTO lista_espera(id_paciente, id_medico, especialidade, prioridade, data_pedido) "
+                         "VALUES(?,?,?,?,?)",
+                         ((i % n_pacientes + 1, i % n_medicos + 1 if i % 2 else None, f"Especialidade {i % 5}",
+                           sorteio.choice((1, 2, 3, 3, 3)), f"2025-02-01 {i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}")
+                          for i in range(n_pedidos)))
+        # Uma ou duas janelas de 3 horas; 70% delas pela manhã
+        janelas = set()
+        for id_espera in range(1, n_pedidos + 1):
+            for _ in range(sorteio.choice((1, 2))):
+                hora = sorteio.choice((8, 9)) if sorteio.random() < 0.7 else sorteio.choice((13, 14, 15))
+                dia = sorteio.choice(dias)
+                janelas.add((id_espera, f"{dia} {hora:02d}:00", f"{dia} {hora + 3:02d}:00"))
+        conn.executemany("INSERT INTO lista_espera_janela(id_espera, inicio, fim) VALUES(?,?,?)", janelas)
+        conn.commit()
+
+        # Período fixo, visto de antes dele (senão todos os horários já teriam passado)
+        agendador, segundos = medir(agendamento_lote.AgendadorLote, conn, date(2025, 3, 3), 7,
+                                    agora=datetime(2025, 3, 1))
+        relatar("carregar pedidos e horários livres", segundos, n_pedidos)
+        relatorio = agendador.resolver()
+        relatar("guloso", relatorio["tempo_guloso"], n_pedidos)
+        relatar("guloso + busca local", relatorio["tempo_total"], n_pedidos)
+        print(f"  preferências atendidas: {relatorio['satisfacao_guloso']:.1%} (guloso) -> "
+              f"{relatorio['satisfacao']:.1%} ({relatorio['trocas']} trocas); "
+              f"{relatorio['agendados']} agendados, {relatorio['sem_horario']} sem horário")
+        gravadas, segundos = medir(agendador.gravar, conn)
+        relatar("gravação (uma transação)", segundos, gravadas)
+
+def bench_integridade(n=2000000, fracao_invalidas=0.01, processos=(0, 1, 2, 4)):
+    """Mede a verificação por faixas de rowid (sem pool e com pools de tamanhos diferentes) e o reparo."""
+    import verificacao_integridade
+    from datetime import datetime, timedelta
+    print(f"Verificação de integridade ({n} consultas, {fracao_invalidas:.0%} inválidas; {os.cpu_count()} CPUs)")
+    with bd_temporario() as conn:
+        popular_bd(conn, n_medicos=200, n_pacientes=50000)
+        # Um horário de 30 minutos por consulta de cada médico, a partir de 2020
+        inicio = datetime(2020, 1, 1, 8)
+        conn.executemany("INSERT INTO consulta(id_medico, id_paciente, data_hora) VALUES(?,?,?)",
+                         ((i % 200 + 1, i % 50000 + 1, (inicio + timedelta(minutes=30 * (i // 200))).strftime("%Y-%m-%d %H:%M"))
+                          for i in range(n)))
+        conn.commit()
+        # Datas em outro formato, órfãs e repetições espalhadas pelo arquivo, como
+        # as deixadas por uma ferramenta que não liga as chaves estrangeiras
+        conn.execute("PRAGMA foreign_keys = OFF")
+        passo = int(1 / fracao_invalidas)
+        conn.execute("UPDATE consulta SET data_hora = replace(data_hora, ' ', 'T') WHERE id_consulta % ? = 0", (passo,))
+        conn.execute("UPDATE consulta SET id_medico = id_medico + 1000 WHERE id_consulta % ? = 1", (passo,))
+        conn.execute("INSERT INTO consulta(id_medico, id_paciente, data_hora) "
+                     "SELECT id_medico, id_paciente, data_hora FROM consulta WHERE id_consulta % ? = 2", (passo,))
+        conn.commit()
+        caminho = conn.execute("PRAGMA database_list").fetchone()[2]
+        for tamanho in processos:
+            violacoes, segundos = medir(verificacao_integridade.verificar, caminho, tamanho)
+            relatar(f"verificar ({tamanho or 'sem'} processos)", segundos, n)
+        tipos = {}
+        for violacao in violacoes:
+            tipos[f"{violacao.tabela}.{violacao.tipo}"] = tipos.get(f"{violacao.tabela}.{violacao.tipo}", 0) + 1
+        print(f"  {len(violacoes)} violações ({', '.join(f'{tipo}: {total}' for tipo, total in sorted(tipos.items()))})")
+        resultado, segundos = medir(verificacao_integridade.reparar, conn, violacoes)
+        relatar(f"reparar (lotes de {verificacao_integridade.TAMANHO_LOTE})", segundos, sum(resultado))
+
+BENCHMARKS = {
+    "crud": bench_crud,
+    "linhas": bench_linhas,
+    "inicio": bench_inicio,
+    "observacoes": bench_observacoes,
+    "deduplicacao": bench_deduplicacao,
+    "lista_espera": bench_lista_espera,
+    "lembretes": bench_lembretes,
+    "cache": bench_cache,
+    "clinicas": bench_clinicas,
+    "agendamento": bench_agendamento,
+    "integridade": bench_integridade,
+}
+
+if __name__ == "__main__":
+    nomes = sys.argv[1:] or list(BENCHMARKS)
+    for nome in nomes:
+        if nome not in BENCHMARKS:
+            print(f"Benchmark desconhecido: {nome}. Disponíveis: {', '.join(BENCHMARKS)}")
+            sys.exit(1)
+        BENCHMARKS[nome]()
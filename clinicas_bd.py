@@ -0,0 +1,219 @@
+"""Um banco de dados por clínica (sharding) para a Agenda Médica.
+
+Cada clínica tem o seu arquivo, DIRETORIO_CLINICAS/clinica_<id>.db, com o
+mesmo esquema do agenda_medica.db; escritas de clínicas diferentes não
+disputam a mesma trava, e backup/vacuum (manutencao_bd.py --bd ARQUIVO)
+podem ser feitos uma clínica por vez. O RoteadorClinicas entrega a conexão
+de cada clínica às funções CRUD de agenda_medica_unificada.
+
+Buscas na rede inteira ("qualquer cardiologista livre") são feitas em todas
+as clínicas e os resultados, já ordenados em cada uma, são intercalados em
+ordem. Há três modos:
+- "anexar": uma conexão faz ATTACH de até SQLITE_LIMIT_ATTACHED clínicas por
+  vez e executa um único UNION ALL ordenado;
+- "processos": cada clínica é lida em um processo, com conexão somente leitura;
+- "sequencial": uma clínica após a outra, com as conexões do roteador.
+
+Uso:
+    python clinicas_bd.py criar ID_CLINICA [...]
+    python clinicas_bd.py livres ESPECIALIDADE "AAAA-MM-DD HH:MM" [--modo anexar]
+"""
+import argparse
+import heapq
+import os
+import re
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from operator import itemgetter
+
+from agenda_medica_unificada import conectar_bd, inicializar_bd, uri_somente_leitura
+
+# Constantes
+DIRETORIO_CLINICAS = "clinicas"
+MODOS_REDE = ("anexar", "processos", "sequencial")
+
+# Buscas na rede: {bd} é o esquema da clínica ("main" ou o alias do ATTACH) e
+# {clinica}, o ID dela, devolvido na primeira coluna
+SQL_MEDICOS_LIVRES = """
+    SELECT {clinica} AS id_clinica, m.id_medico, m.nome, m.especialidade
+    FROM {bd}.medico m
+    WHERE m.especialidade = ?
+      AND NOT EXISTS (SELECT 1 FROM {bd}.consulta c WHERE c.id_medico = m.id_medico AND c.data_hora = ?)
+    """
+
+SQL_CONSULTAS_PERIODO = """
+    SELECT {clinica} AS id_clinica, c.id_consulta, c.data_hora, m.nome AS nome_medico, p.nome AS nome_paciente
+    FROM {bd}.consulta c
+    JOIN {bd}.medico m ON c.id_medico = m.id_medico
+    JOIN {bd}.paciente p ON c.id_paciente = p.id_paciente
+    WHERE c.data_hora >= ? AND c.data_hora < ?
+    """
+
+def _sql_ordenado(sql, ordem):
+    return f"{sql} ORDER BY {', '.join(str(coluna + 1) for coluna in ordem)}"
+
+def _executar_na_clinica(conn, id_clinica, sql, parametros, ordem):
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    try:
+        return cursor.execute(_sql_ordenado(sql.format(bd="main", clinica=int(id_clinica)), ordem), parametros).fetchall()
+    finally:
+        cursor.close()
+
+def _consultar_clinica(caminho, id_clinica, sql, parametros, ordem):
+    """Executa a busca em uma clínica com uma conexão somente leitura própria (modo "processos")."""
+    conn = sqlite3.connect(uri_somente_leitura(caminho), uri=True)
+    try:
+        return _executar_na_clinica(conn, id_clinica, sql, parametros, ordem)
+    finally:
+        conn.close()
+
+class RoteadorClinicas:
+    """Localiza e mantém abertas as conexões de cada clínica."""
+
+    def __init__(self, diretorio=DIRETORIO_CLINICAS, processos=None):
+        self.diretorio = diretorio
+        self.processos = processos # Número de processos do modo "processos" (padrão: um por CPU)
+        self.conexoes = {}
+        self._executor = None
+
+    def caminho(self, id_clinica):
+        return os.path.join(self.diretorio, f"clinica_{int(id_clinica)}.db")
+
+    def clinicas(self):
+        """IDs das clínicas existentes no diretório, em ordem."""
+        if not os.path.isdir(self.diretorio):
+            return []
+        encontradas = (re.fullmatch(r"clinica_(\d+)\.db", nome) for nome in os.listdir(self.diretorio))
+        return sorted(int(encontrada.group(1)) for encontrada in encontradas if encontrada)
+
+    def criar_clinica(self, id_clinica):
+        """Cria (ou abre) o banco da clínica e retorna a conexão."""
+        os.makedirs(self.diretorio, exist_ok=True)
+        conn = inicializar_bd(self.caminho(id_clinica))
+        if conn is not None:
+            self.conexoes[int(id_clinica)] = conn
+        return conn
+
+    def conexao(self, id_clinica):
+        """Conexão da clínica (aberta na primeira vez). Retorna None se a clínica não existe."""
+        id_clinica = int(id_clinica)
+        conn = self.conexoes.get(id_clinica)
+        if conn is None:
+            caminho = self.caminho(id_clinica)
+            if not os.path.exists(caminho):
+                print(f"Clínica {id_clinica} não encontrada em '{self.diretorio}'.")
+                return None
+            conn = self.conexoes[id_clinica] = conectar_bd(caminho)
+        return conn
+
+    def executar(self, id_clinica, funcao, *args, **kwargs):
+        """Chama uma função CRUD com a conexão da clínica: executar(2, adicionar_consulta, ...)."""
+        conn = self.conexao(id_clinica)
+        if conn is None:
+            return None
+        return funcao(conn, *args, **kwargs)
+
+    def fechar(self):
+        for conn in self.conexoes.values():
+            conn.close()
+        self.conexoes.clear()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+    # --- Buscas na rede ---
+
+    def consultar_rede(self, sql, parametros=(), ordem=(0,), modo="anexar", clinicas=None):
+        """Executa `sql` em todas as clínicas e retorna as linhas intercaladas pela coluna `ordem`.
+
+        `sql` usa {bd} antes dos nomes das tabelas e {clinica} na primeira
+        coluna (ver SQL_MEDICOS_LIVRES); `ordem` são os índices (a partir de 0)
+        das colunas de ordenação.
+        """
+        if modo not in MODOS_REDE:
+            raise ValueError(f"Modo inválido: {modo}. Use um de {MODOS_REDE}.")
+        clinicas = self.clinicas() if clinicas is None else list(clinicas)
+        parametros = tuple(parametros)
+        if modo == "anexar":
+            partes = self._consultar_anexando(clinicas, sql, parametros, ordem)
+        elif modo == "processos":
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.processos)
+            futuros = [self._executor.submit(_consultar_clinica, self.caminho(id_clinica), id_clinica, sql, parametros, ordem)
+                       for id_clinica in clinicas]
+            partes = [futuro.result() for futuro in futuros]
+        else: # Reaproveita as conexões já abertas pelo roteador
+            partes = [_executar_na_clinica(self.conexao(id_clinica), id_clinica, sql, parametros, ordem)
+                      for id_clinica in clinicas]
+        # Cada parte já vem ordenada: a intercalação é O(n log k) para k partes
+        return list(heapq.merge(*partes, key=itemgetter(*ordem)))
+
+    def _consultar_anexando(self, clinicas, sql, parametros, ordem):
+        """Um UNION ALL ordenado para cada grupo de clínicas que cabe no limite de ATTACH."""
+        conn = sqlite3.connect(":memory:", uri=True)
+        try:
+            limite = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED) if hasattr(conn, "getlimit") else 10
+            partes = []
+            for inicio in range(0, len(clinicas), limite):
+                grupo = clinicas[inicio:inicio + limite]
+                for id_clinica in grupo:
+                    conn.execute("ATTACH DATABASE ? AS ?", (uri_somente_leitura(self.caminho(id_clinica)), f"clinica_{id_clinica}"))
+                try:
+                    uniao = " UNION ALL ".join(
+                        f"SELECT * FROM ({sql.format(bd=f'clinica_{id_clinica}', clinica=int(id_clinica))})"
+                        for id_clinica in grupo)
+                    partes.append(conn.execute(_sql_ordenado(uniao, ordem), parametros * len(grupo)).fetchall())
+                finally:
+                    for id_clinica in grupo:
+                        conn.execute(f"DETACH DATABASE clinica_{id_clinica}")
+            return partes
+        finally:
+            conn.close()
+
+    def medicos_livres(self, especialidade, data_hora, modo="anexar"):
+        """Médicos da especialidade sem consulta em data_hora, em todas as clínicas.
+
+        Retorna tuplas (id_clinica, id_medico, nome, especialidade) ordenadas por nome.
+        """
+        return self.consultar_rede(SQL_MEDICOS_LIVRES, (especialidade, data_hora), ordem=(2, 0, 1), modo=modo)
+
+    def consultas_periodo(self, inicio, fim, modo="anexar"):
+        """Consultas de todas as clínicas com inicio <= data_hora < fim, em ordem de data_hora."""
+        return self.consultar_rede(SQL_CONSULTAS_PERIODO, (inicio, fim), ordem=(2, 0, 1), modo=modo)
+
+#############################
+# LINHA DE COMANDO #
+#############################
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bancos de dados por clínica da Agenda Médica.")
+    parser.add_argument("--diretorio", default=DIRETORIO_CLINICAS)
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    criar = comandos.add_parser("criar", help="cria o banco de uma ou mais clínicas")
+    criar.add_argument("ids", type=int, nargs="+")
+    livres = comandos.add_parser("livres", help="médicos livres de uma especialidade em toda a rede")
+    livres.add_argument("especialidade")
+    livres.add_argument("data_hora")
+    livres.add_argument("--modo", choices=MODOS_REDE, default="anexar")
+    args = parser.parse_args(argv)
+
+    with RoteadorClinicas(args.diretorio) as roteador:
+        if args.comando == "criar":
+            for id_clinica in args.ids:
+                roteador.criar_clinica(id_clinica)
+        else:
+            medicos = roteador.medicos_livres(args.especialidade, args.data_hora, args.modo)
+            for id_clinica, id_medico, nome, especialidade in medicos:
+                print(f"  Clínica {id_clinica}: {nome} ({especialidade}) - ID {id_medico}")
+            print(f"{len(medicos)} médicos livres.")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
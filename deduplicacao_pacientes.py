@@ -0,0 +1,192 @@
+"""Deduplicação de pacientes da Agenda Médica.
+
+Os candidatos a duplicado são agrupados por chaves indexadas (blocagem), sem
+comparar todos os pacientes entre si. São unidos automaticamente só os
+pacientes com o mesmo nome (normalizar_nome: sem acentos, maiúsculas nem
+pontuação), a mesma data de nascimento e telefones que não conflitam (iguais
+ou um deles ausente). O paciente mais antigo (menor ID) de cada grupo é
+mantido; as consultas dos demais são transferidas para ele com UPDATEs em lote
+e os duplicados removidos.
+
+Os demais suspeitos (mesmo telefone e nome de mesma pronúncia ou parecido, ou
+mesma chave fonética e data de nascimento) podem ser parentes, como
+"Gabriel"/"Gabriela" Souza com o telefone da família, e só são listados
+por --revisar.
+
+Uso:
+    python deduplicacao_pacientes.py [--bd ARQUIVO] [--simular] [--limiar 0.6] [--revisar]
+"""
+import argparse
+import sqlite3
+
+from agenda_medica_unificada import (DB_FILE, conectar_bd, migrar_bd, normalizar_nome,
+                                     similaridade_nomes)
+
+# Constantes
+LIMIAR_SIMILARIDADE = 0.6 # Similaridade mínima entre nomes para a revisão
+TAMANHO_LOTE = 50000 # Duplicados unidos por transação
+TAMANHO_MAXIMO_BLOCO = 20 # Telefones com mais pacientes que isso (ex.: "0000-0000") são ignorados na revisão
+
+SQL_CRIAR_MAPA_FUSAO = "CREATE TEMP TABLE IF NOT EXISTS mapa_fusao (id_antigo INTEGER PRIMARY KEY, id_novo INTEGER NOT NULL)"
+
+def _registrar_funcoes(conn):
+    conn.create_function("similaridade_nomes", 2, similaridade_nomes, deterministic=True)
+    conn.create_function("normalizar_nome", 1, normalizar_nome, deterministic=True)
+
+def construir_mapa_fusao(conn):
+    """Preenche a tabela temporária mapa_fusao (id_antigo -> id_novo). Retorna quantos duplicados achou."""
+    _registrar_funcoes(conn)
+    conn.execute(SQL_CRIAR_MAPA_FUSAO)
+    conn.execute("DELETE FROM mapa_fusao")
+    # Blocos por (chave fonética, data de nascimento), no índice idx_paciente_nome_fonetico,
+    # divididos pelo nome normalizado. Se o grupo tem no máximo um telefone,
+    # todos vão para o paciente mais antigo; se tem telefones diferentes (homônimos
+    # nascidos no mesmo dia), só os de mesmo telefone são unidos e os sem
+    # telefone, ambíguos, ficam para a revisão.
+    grupos = """
+    SELECT nome_fonetico, data_nascimento, normalizar_nome(nome) AS nome_normalizado,
+           COUNT(DISTINCT telefone_normalizado) AS telefones, {telefone} MIN(id_paciente) AS id_novo
+    FROM paciente
+    WHERE data_nascimento IS NOT NULL AND data_nascimento != ''
+    GROUP BY nome_fonetico, data_nascimento, nome_normalizado {por_telefone}
+    HAVING COUNT(*) > 1
+    """
+    conn.execute(f"""
+    INSERT OR IGNORE INTO mapa_fusao (id_antigo, id_novo)
+    SELECT p.id_paciente, g.id_novo
+    FROM ({grupos.format(telefone="", por_telefone="")}) g
+    JOIN paciente p ON p.nome_fonetico = g.nome_fonetico AND p.data_nascimento = g.data_nascimento
+    WHERE g.telefones <= 1 AND p.id_paciente != g.id_novo AND normalizar_nome(p.nome) = g.nome_normalizado
+    """)
+    conn.execute(f"""
+    INSERT OR IGNORE INTO mapa_fusao (id_antigo, id_novo)
+    SELECT p.id_paciente, g.id_novo
+    FROM ({grupos.format(telefone="telefone_normalizado,", por_telefone=", telefone_normalizado")}) g
+    JOIN paciente p ON p.nome_fonetico = g.nome_fonetico AND p.data_nascimento = g.data_nascimento
+    WHERE p.telefone_normalizado IS g.telefone_normalizado AND p.id_paciente != g.id_novo
+      AND normalizar_nome(p.nome) = g.nome_normalizado
+    """)
+    return conn.execute("SELECT COUNT(*) FROM mapa_fusao").fetchone()[0]
+
+def aplicar_fusao(conn, tamanho_lote=TAMANHO_LOTE):
+    """Une os pacientes de mapa_fusao em transações de até `tamanho_lote` duplicados.
+
+    Cada lote é uma faixa de id_antigo: as consultas e os pedidos da lista de
+    espera são transferidos, a data de nascimento ausente no paciente mantido
+    é completada e os duplicados são removidos. Retorna o número de pacientes removidos.
+    """
+    removidos = 0
+    ultimo = 0
+    while True:
+        faixa = conn.execute("""
+        SELECT MIN(id_antigo), MAX(id_antigo), COUNT(*)
+        FROM (SELECT id_antigo FROM mapa_fusao WHERE id_antigo > ? ORDER BY id_antigo LIMIT ?)
+        """, (ultimo, tamanho_lote)).fetchone()
+        inicio, fim, quantidade = faixa
+        if not quantidade:
+            break
+        try:
+            conn.execute("""
+            UPDATE consulta
+            SET id_paciente = (SELECT id_novo FROM mapa_fusao WHERE id_antigo = consulta.id_paciente)
+            WHERE id_paciente IN (SELECT id_antigo FROM mapa_fusao WHERE id_antigo BETWEEN ? AND ?)
+            """, (inicio, fim))
+            conn.execute("""
+            UPDATE lista_espera
+            SET id_paciente = (SELECT id_novo FROM mapa_fusao WHERE id_antigo = lista_espera.id_paciente)
+            WHERE id_paciente IN (SELECT id_antigo FROM mapa_fusao WHERE id_antigo BETWEEN ? AND ?)
+            """, (inicio, fim))
+            conn.execute("""
+            UPDATE paciente
+            SET data_nascimento = (
+                SELECT d.data_nascimento
+                FROM mapa_fusao f JOIN paciente d ON d.id_paciente = f.id_antigo
+                WHERE f.id_novo = paciente.id_paciente AND f.id_antigo BETWEEN ? AND ?
+                  AND d.data_nascimento IS NOT NULL AND d.data_nascimento != ''
+                LIMIT 1)
+            WHERE (data_nascimento IS NULL OR data_nascimento = '')
+              AND id_paciente IN (SELECT id_novo FROM mapa_fusao WHERE id_antigo BETWEEN ? AND ?)
+            """, (inicio, fim, inicio, fim))
+            removidos += conn.execute("""
+            DELETE FROM paciente WHERE id_paciente IN (SELECT id_antigo FROM mapa_fusao WHERE id_antigo BETWEEN ? AND ?)
+            """, (inicio, fim)).rowcount
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Erro ao unir pacientes {inicio} a {fim}: {e}")
+            conn.rollback()
+            break
+        print(f"{removidos} pacientes duplicados unidos...")
+        ultimo = fim
+    return removidos
+
+def candidatos_revisao(conn, limiar=LIMIAR_SIMILARIDADE, tamanho_maximo_bloco=TAMANHO_MAXIMO_BLOCO):
+    """Pares suspeitos que não são unidos automaticamente (podem ser parentes).
+
+    São os pacientes com o mesmo telefone e a mesma chave fonética ou nomes
+    parecidos, e os com a mesma chave fonética e data de nascimento, fora os
+    pares que construir_mapa_fusao já une. Retorna uma lista de
+    (id_a, nome_a, id_b, nome_b, similaridade) para revisão manual.
+    """
+    _registrar_funcoes(conn)
+    conn.execute(SQL_CRIAR_MAPA_FUSAO)
+    return conn.execute("""
+    WITH blocos AS (
+        SELECT telefone_normalizado FROM paciente
+        WHERE telefone_normalizado IS NOT NULL
+        GROUP BY telefone_normalizado
+        HAVING COUNT(*) BETWEEN 2 AND ?
+    ),
+    pares AS (
+        SELECT a.id_paciente AS id_a, b.id_paciente AS id_b
+        FROM blocos
+        JOIN paciente a ON a.telefone_normalizado = blocos.telefone_normalizado
+        JOIN paciente b ON b.telefone_normalizado = blocos.telefone_normalizado AND b.id_paciente > a.id_paciente
+        UNION
+        SELECT a.id_paciente, b.id_paciente
+        FROM paciente a
+        JOIN paciente b ON b.nome_fonetico = a.nome_fonetico AND b.data_nascimento = a.data_nascimento
+                       AND b.id_paciente > a.id_paciente
+        WHERE a.nome_fonetico != '' AND a.data_nascimento IS NOT NULL AND a.data_nascimento != ''
+    )
+    SELECT a.id_paciente, a.nome, b.id_paciente, b.nome, similaridade_nomes(a.nome, b.nome) AS similaridade
+    FROM pares
+    JOIN paciente a ON a.id_paciente = pares.id_a
+    JOIN paciente b ON b.id_paciente = pares.id_b
+    WHERE (a.nome_fonetico = b.nome_fonetico OR similaridade >= ?)
+      AND COALESCE((SELECT id_novo FROM mapa_fusao WHERE id_antigo = a.id_paciente), a.id_paciente)
+          != COALESCE((SELECT id_novo FROM mapa_fusao WHERE id_antigo = b.id_paciente), b.id_paciente)
+    ORDER BY similaridade DESC
+    """, (tamanho_maximo_bloco, limiar)).fetchall()
+
+def deduplicar(conn, simular=False, tamanho_lote=TAMANHO_LOTE):
+    """Executa a deduplicação completa. Retorna o número de duplicados encontrados (ou unidos)."""
+    migrar_bd(conn) # Garante as colunas normalizadas e os índices
+    encontrados = construir_mapa_fusao(conn)
+    print(f"{encontrados} pacientes duplicados encontrados.")
+    if simular or not encontrados:
+        conn.commit() # Só mapa_fusao (temporária) foi alterada; candidatos_revisao a usa
+        return encontrados
+    return aplicar_fusao(conn, tamanho_lote)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Une pacientes duplicados da Agenda Médica.")
+    parser.add_argument("--bd", default=None, help=f"arquivo do banco (padrão: {DB_FILE})")
+    parser.add_argument("--limiar", type=float, default=LIMIAR_SIMILARIDADE)
+    parser.add_argument("--simular", action="store_true", help="só conta os duplicados, sem alterar o banco")
+    parser.add_argument("--revisar", action="store_true", help="lista pares suspeitos que não são unidos automaticamente")
+    args = parser.parse_args(argv)
+
+    conn = conectar_bd(args.bd)
+    if conn is None:
+        return 1
+    try:
+        deduplicar(conn, args.simular)
+        if args.revisar:
+            for id_a, nome_a, id_b, nome_b, similaridade in candidatos_revisao(conn, args.limiar):
+                print(f"  {id_a} '{nome_a}'  ~  {id_b} '{nome_b}'  ({similaridade:.0%})")
+        return 0
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,328 @@
+"""Lembretes de consulta da Agenda Médica.
+
+O serviço envia um lembrete 24 horas e outro 1 hora antes de cada consulta.
+A cada varredura, apenas as consultas das próximas horas são lidas, por uma
+busca por faixa de data_hora no índice idx_consulta_data_hora, e colocadas
+em um heap ordenado pelo instante de envio. Os envios são feitos por um
+conjunto limitado de threads, e cada lembrete enviado é registrado na tabela
+lembrete_enviado: ao reiniciar, o serviço retoma da hora atual sem reler a
+tabela consulta inteira e sem repetir lembretes.
+
+O envio é feito por um "remetente" (qualquer objeto com o método
+enviar(lembrete)); RemetenteArquivo grava as mensagens em um arquivo ou no
+console, no lugar de SMS ou e-mail.
+
+Uso:
+    python lembretes_consulta.py [--bd ARQUIVO] [--saida ARQUIVO] [--trabalhadores 4] [--uma-vez]
+"""
+import argparse
+import heapq
+import sqlite3
+import sys
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from agenda_medica_unificada import DB_FILE, conectar_bd
+
+# Constantes
+ANTECEDENCIAS = {"24h": timedelta(hours=24), "1h": timedelta(hours=1)} # Tipo de lembrete -> antecedência
+INTERVALO_VARREDURA = 60 # Segundos entre as buscas por consultas novas ou alteradas
+TRABALHADORES = 4 # Threads de envio
+TEMPO_RESERVA = 300 # Segundos após os quais um envio em 'enviando' é considerado abandonado
+FORMATO_DATA_HORA = "%Y-%m-%d %H:%M"
+
+# Dados entregues ao remetente
+Lembrete = namedtuple("Lembrete", ("id_consulta", "tipo", "data_hora", "nome_paciente", "telefone", "nome_medico"))
+
+SQL_CRIAR_LEMBRETE_ENVIADO = """
+    CREATE TABLE IF NOT EXISTS lembrete_enviado (
+        id_consulta INTEGER NOT NULL,
+        tipo TEXT NOT NULL, -- Chave de ANTECEDENCIAS
+        data_hora TEXT NOT NULL, -- Horário da consulta no envio: remarcar gera um novo lembrete
+        situacao TEXT NOT NULL, -- 'enviando' ou 'enviado'
+        enviado_em TEXT,
+        reservado_em TEXT, -- Início do envio, para liberar reservas abandonadas
+        PRIMARY KEY (id_consulta, tipo, data_hora),
+        FOREIGN KEY (id_consulta) REFERENCES consulta (id_consulta) ON DELETE CASCADE
+    ) WITHOUT ROWID
+    """
+
+def criar_tabela_lembretes(conn):
+    """Cria a tabela de controle de envios (ou acrescenta reservado_em a uma tabela antiga)."""
+    conn.execute(SQL_CRIAR_LEMBRETE_ENVIADO)
+    colunas = {linha[1] for linha in conn.execute("PRAGMA table_info(lembrete_enviado)")}
+    if "reservado_em" not in colunas:
+        conn.execute("ALTER TABLE lembrete_enviado ADD COLUMN reservado_em TEXT")
+    conn.commit()
+
+def liberar_reservas_abandonadas(conn, tempo_reserva=TEMPO_RESERVA):
+    """Remove as reservas em 'enviando' feitas há mais de `tempo_reserva` segundos.
+
+    São de um serviço que parou no meio do envio: o lembrete volta a ser
+    enviado (o remetente pode recebê-lo duas vezes, mas nunca deixa de
+    recebê-lo). Reservas recentes podem ser de outra instância em execução e
+    não são tocadas. Retorna quantas foram liberadas.
+    """
+    limite = (datetime.now() - timedelta(seconds=tempo_reserva)).strftime("%Y-%m-%d %H:%M:%S")
+    liberadas = conn.execute("""
+    DELETE FROM lembrete_enviado
+    WHERE situacao = 'enviando' AND (reservado_em IS NULL OR reservado_em < ?)
+    """, (limite,)).rowcount
+    conn.commit()
+    return liberadas
+
+#############################
+# REMETENTES #
+#############################
+
+class RemetenteArquivo:
+    """Remetente de teste: grava uma linha por lembrete em um arquivo (ou no console)."""
+
+    def __init__(self, caminho=None):
+        self.arquivo = open(caminho, "a", encoding="utf-8") if caminho else sys.stdout
+        self.trava = threading.Lock() # Várias threads de envio gravam no mesmo arquivo
+
+    def enviar(self, lembrete):
+        mensagem = (f"[{lembrete.tipo}] {lembrete.telefone or 'sem telefone'}: Olá, {lembrete.nome_paciente}! "
+                    f"Lembrete da sua consulta com {lembrete.nome_medico} em {lembrete.data_hora}.")
+        with self.trava:
+            self.arquivo.write(mensagem + "\n")
+            self.arquivo.flush()
+
+    def fechar(self):
+        if self.arquivo is not sys.stdout:
+            self.arquivo.close()
+
+#############################
+# SERVIÇO DE LEMBRETES #
+#############################
+
+class ServicoLembretes:
+    """Agenda e envia os lembretes das consultas.
+
+    O heap guarda (instante_envio, id_consulta, tipo, data_hora) apenas das
+    consultas dentro da janela da maior antecedência mais duas varreduras, então
+    a memória usada depende das consultas de um dia, e não do total. Consultas
+    remarcadas ou deletadas depois de entrar no heap são conferidas no banco
+    antes do envio.
+    """
+
+    def __init__(self, remetente, db_file=None, trabalhadores=TRABALHADORES,
+                 intervalo_varredura=INTERVALO_VARREDURA, tempo_reserva=TEMPO_RESERVA):
+        self.remetente = remetente
+        self.db_file = db_file
+        self.intervalo_varredura = intervalo_varredura
+        self.tempo_reserva = tempo_reserva
+        self.heap = []
+        self.agendados = set() # (id_consulta, tipo, data_hora) no heap ou sendo enviados
+        self.trava = threading.Lock()
+        self.enviados = 0
+        self.falhas = 0
+        self.parada = threading.Event()
+        self.thread = None
+        self.executor = ThreadPoolExecutor(max_workers=trabalhadores, thread_name_prefix="lembrete")
+        # Limita os envios em andamento: o laço principal espera quando os trabalhadores estão ocupados
+        self.limite_envios = trabalhadores * 4
+        self.vagas = threading.BoundedSemaphore(self.limite_envios)
+        self.conexoes = threading.local() # Uma conexão por thread de envio
+        self.conexoes_abertas = [] # Todas elas, para parar() fechar
+        self.conn = self._conectar(check_same_thread=False) # Usada pela thread do laço principal
+        criar_tabela_lembretes(self.conn)
+
+    def _conectar(self, check_same_thread=True):
+        conn = conectar_bd(self.db_file, check_same_thread)
+        if conn is None:
+            raise RuntimeError("Não foi possível conectar ao banco de dados.")
+        conn.execute("PRAGMA busy_timeout = 5000") # Espera as outras conexões liberarem o banco
+        return conn
+
+    def _conexao_trabalhador(self):
+        conn = getattr(self.conexoes, "conn", None)
+        if conn is None:
+            # Usada só pela própria thread; check_same_thread=False para parar() poder fechá-la
+            conn = self.conexoes.conn = self._conectar(check_same_thread=False)
+            with self.trava:
+                self.conexoes_abertas.append(conn)
+        return conn
+
+    # --- Varredura ---
+
+    def varrer(self, agora=None):
+        """Coloca no heap os lembretes ainda não enviados das próximas horas. Retorna quantos entraram."""
+        agora = agora or datetime.now()
+        folga = timedelta(seconds=2 * self.intervalo_varredura)
+        # Da menor para a maior antecedência: um lembrete só é enviado enquanto
+        # faltar mais tempo que a antecedência do próximo (não envia o de 24h
+        # a 30 minutos da consulta, junto com o de 1h)
+        tipos = sorted(ANTECEDENCIAS.items(), key=lambda item: item[1])
+        novos = 0
+        cursor = self.conn.cursor()
+        cursor.row_factory = None
+        try:
+            liberar_reservas_abandonadas(self.conn, self.tempo_reserva)
+            limite_inferior = timedelta(0)
+            for tipo, antecedencia in tipos:
+                cursor.execute("""
+                SELECT c.id_consulta, c.data_hora FROM consulta c
+                WHERE c.data_hora > ? AND c.data_hora <= ?
+                  AND NOT EXISTS (SELECT 1 FROM lembrete_enviado e
+                                  WHERE e.id_consulta = c.id_consulta AND e.tipo = ? AND e.data_hora = c.data_hora)
+                """, ((agora + limite_inferior).strftime(FORMATO_DATA_HORA),
+                      (agora + antecedencia + folga).strftime(FORMATO_DATA_HORA), tipo))
+                for id_consulta, data_hora in cursor: # Lidas aos poucos, sem fetchall
+                    try:
+                        instante = datetime.strptime(data_hora, FORMATO_DATA_HORA) - antecedencia
+                    except ValueError: # data_hora fora do formato: sem lembrete
+                        continue
+                    chave = (id_consulta, tipo, data_hora)
+                    with self.trava:
+                        if chave in self.agendados:
+                            continue
+                        self.agendados.add(chave)
+                        heapq.heappush(self.heap, (instante.timestamp(), id_consulta, tipo, data_hora))
+                    novos += 1
+                limite_inferior = antecedencia
+        except sqlite3.Error as e:
+            print(f"Erro ao buscar consultas para lembretes: {e}")
+        finally:
+            cursor.close()
+        return novos
+
+    # --- Envio ---
+
+    def despachar_vencidos(self, agora=None):
+        """Entrega aos trabalhadores os lembretes cujo instante de envio já chegou. Retorna quantos."""
+        agora = (agora or datetime.now()).timestamp()
+        despachados = 0
+        while True:
+            with self.trava:
+                if not self.heap or self.heap[0][0] > agora:
+                    return despachados
+                _, id_consulta, tipo, data_hora = heapq.heappop(self.heap)
+            self.vagas.acquire()
+            self.executor.submit(self._enviar, id_consulta, tipo, data_hora)
+            despachados += 1
+
+    def _enviar(self, id_consulta, tipo, data_hora):
+        chave = (id_consulta, tipo, data_hora)
+        conn = self._conexao_trabalhador()
+        try:
+            linha = conn.execute("""
+            SELECT c.data_hora, p.nome, p.telefone, m.nome
+            FROM consulta c
+            JOIN paciente p ON c.id_paciente = p.id_paciente
+            JOIN medico m ON c.id_medico = m.id_medico
+            WHERE c.id_consulta = ?
+            """, (id_consulta,)).fetchone()
+            if linha is None or linha[0] != data_hora: # Deletada ou remarcada
+                return
+            # Reserva o envio: se outra instância do serviço já o fez, não repete
+            reservado = conn.execute("""
+            INSERT OR IGNORE INTO lembrete_enviado(id_consulta, tipo, data_hora, situacao, reservado_em)
+            VALUES(?,?,?,'enviando',?)
+            """, chave + (datetime.now().strftime("%Y-%m-%d %H:%M:%S"),)).rowcount
+            conn.commit()
+            if not reservado:
+                return
+            try:
+                self.remetente.enviar(Lembrete(id_consulta, tipo, data_hora, linha[1], linha[2], linha[3]))
+            except Exception as e: # Libera a reserva para a próxima varredura tentar de novo
+                print(f"Erro ao enviar lembrete da consulta ID {id_consulta}: {e}")
+                conn.execute("DELETE FROM lembrete_enviado WHERE id_consulta = ? AND tipo = ? AND data_hora = ?", chave)
+                conn.commit()
+                with self.trava:
+                    self.falhas += 1
+                return
+            conn.execute("""
+            UPDATE lembrete_enviado SET situacao = 'enviado', enviado_em = ?
+            WHERE id_consulta = ? AND tipo = ? AND data_hora = ?
+            """, (datetime.now().strftime("%Y-%m-%d %H:%M:%S"),) + chave)
+            conn.commit()
+            with self.trava:
+                self.enviados += 1
+        except sqlite3.Error as e:
+            print(f"Erro ao registrar lembrete da consulta ID {id_consulta}: {e}")
+            conn.rollback()
+        finally:
+            with self.trava:
+                self.agendados.discard(chave)
+            self.vagas.release()
+
+    # --- Execução ---
+
+    def executar_uma_vez(self, agora=None):
+        """Varre e despacha uma vez, esperando os envios terminarem. Retorna quantos foram enviados."""
+        antes = self.enviados
+        self.varrer(agora)
+        self.despachar_vencidos(agora)
+        self.aguardar_envios()
+        return self.enviados - antes
+
+    def aguardar_envios(self):
+        """Bloqueia até não haver envios em andamento."""
+        for _ in range(self.limite_envios):
+            self.vagas.acquire()
+        for _ in range(self.limite_envios):
+            self.vagas.release()
+
+    def _laco(self):
+        proxima_varredura = 0
+        while not self.parada.is_set():
+            if time.time() >= proxima_varredura:
+                self.varrer()
+                proxima_varredura = time.time() + self.intervalo_varredura
+            self.despachar_vencidos()
+            with self.trava:
+                proximo_envio = self.heap[0][0] if self.heap else proxima_varredura
+            self.parada.wait(max(0, min(proximo_envio, proxima_varredura) - time.time()))
+
+    def iniciar(self):
+        self.thread = threading.Thread(target=self._laco, name="lembretes", daemon=True)
+        self.thread.start()
+
+    def parar(self):
+        self.parada.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.executor.shutdown(wait=True)
+        with self.trava:
+            conexoes, self.conexoes_abertas = self.conexoes_abertas, []
+        for conn in conexoes:
+            conn.close()
+        self.conn.close()
+
+#############################
+# LINHA DE COMANDO #
+#############################
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Envia lembretes das consultas da Agenda Médica.")
+    parser.add_argument("--bd", default=None, help=f"arquivo do banco (padrão: {DB_FILE})")
+    parser.add_argument("--saida", default=None, help="arquivo onde gravar as mensagens (padrão: console)")
+    parser.add_argument("--trabalhadores", type=int, default=TRABALHADORES)
+    parser.add_argument("--intervalo", type=float, default=INTERVALO_VARREDURA, help="segundos entre varreduras")
+    parser.add_argument("--uma-vez", action="store_true", help="envia os lembretes vencidos e termina")
+    args = parser.parse_args(argv)
+
+    remetente = RemetenteArquivo(args.saida)
+    servico = ServicoLembretes(remetente, args.bd, args.trabalhadores, args.intervalo)
+    try:
+        if args.uma_vez:
+            print(f"{servico.executar_uma_vez()} lembretes enviados.")
+        else:
+            servico.iniciar()
+            print("Serviço de lembretes em execução. Pressione Ctrl+C para parar.")
+            while True:
+                time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servico.parar()
+        remetente.fechar()
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,315 @@
+"""Manutenção do banco de dados da Agenda Médica.
+
+Backups online (sem parar a aplicação), compactação, vacuum incremental,
+estatísticas para o planejador de consultas e relatórios de tamanho/fragmentação.
+
+Uso:
+    python manutencao_bd.py relatorio
+    python manutencao_bd.py backup DIRETORIO [--manter 7]
+    python manutencao_bd.py compactar DESTINO
+    python manutencao_bd.py vacuum [--paginas N]
+    python manutencao_bd.py otimizar [--analyze]
+    python manutencao_bd.py agendar DIRETORIO_BACKUP [--intervalo-backup H] [--intervalo-otimizacao H]
+"""
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from agenda_medica_unificada import DB_FILE, conectar_bd
+
+# Constantes
+PAGINAS_POR_PASSO = 256 # Páginas copiadas por passo do backup online
+PAUSA_ENTRE_PASSOS = 0.01 # Segundos liberando o banco para a aplicação entre os passos
+PREFIXO_BACKUP = "agenda_medica_"
+
+#############################
+# RELATÓRIOS #
+#############################
+
+def relatorio_arquivo(conn, db_file=None):
+    """Retorna um dicionário com o tamanho do arquivo e a fragmentação do banco.
+
+    A fragmentação é a fração de páginas livres (freelist), que só é devolvida
+    ao sistema de arquivos por VACUUM ou incremental_vacuum. Quando o SQLite
+    tem a tabela virtual dbstat, `espaco_nao_usado` traz também a fração de
+    bytes vazios dentro das páginas em uso (None se indisponível).
+    """
+    db_file = db_file or DB_FILE
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    freelist_count = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+    try:
+        nao_usado, total = conn.execute("SELECT SUM(unused), SUM(pgsize) FROM dbstat").fetchone()
+        espaco_nao_usado = nao_usado / total if total else 0.0
+    except sqlite3.OperationalError: # SQLite compilado sem SQLITE_ENABLE_DBSTAT_VTAB
+        espaco_nao_usado = None
+    return {
+        "tamanho_arquivo": os.path.getsize(db_file) if os.path.exists(db_file) else 0,
+        "page_size": page_size,
+        "page_count": page_count,
+        "freelist_count": freelist_count,
+        "fragmentacao": freelist_count / page_count if page_count else 0.0,
+        "espaco_nao_usado": espaco_nao_usado,
+        "auto_vacuum": {0: "NONE", 1: "FULL", 2: "INCREMENTAL"}.get(auto_vacuum, str(auto_vacuum)),
+    }
+
+def imprimir_relatorio(relatorio, titulo="Relatório do banco de dados"):
+    print(f"{titulo}:")
+    print(f"  Tamanho do arquivo: {relatorio['tamanho_arquivo'] / 1024:.1f} KiB")
+    print(f"  Páginas: {relatorio['page_count']} x {relatorio['page_size']} bytes")
+    print(f"  Páginas livres: {relatorio['freelist_count']} ({relatorio['fragmentacao']:.1%})")
+    if relatorio["espaco_nao_usado"] is not None:
+        print(f"  Espaço não usado nas páginas: {relatorio['espaco_nao_usado']:.1%}")
+    print(f"  auto_vacuum: {relatorio['auto_vacuum']}")
+
+def comparar_relatorios(antes, depois):
+    """Imprime a diferença de tamanho e fragmentação entre dois relatórios."""
+    economia = antes["tamanho_arquivo"] - depois["tamanho_arquivo"]
+    print(f"Tamanho: {antes['tamanho_arquivo'] / 1024:.1f} KiB -> {depois['tamanho_arquivo'] / 1024:.1f} KiB "
+          f"({economia / 1024:.1f} KiB liberados)")
+    print(f"Fragmentação: {antes['fragmentacao']:.1%} -> {depois['fragmentacao']:.1%}")
+    if antes["espaco_nao_usado"] is not None:
+        print(f"Espaço não usado nas páginas: {antes['espaco_nao_usado']:.1%} -> {depois['espaco_nao_usado']:.1%}")
+
+#############################
+# BACKUP ONLINE #
+#############################
+
+def fazer_backup(destino, db_file=None, paginas_por_passo=PAGINAS_POR_PASSO, pausa=PAUSA_ENTRE_PASSOS):
+    """Copia o banco para `destino` com a API de backup online do SQLite.
+
+    A cópia é feita em passos de `paginas_por_passo` páginas, liberando o
+    banco por `pausa` segundos entre eles, então a aplicação continua lendo e
+    gravando durante o backup. Se o banco mudar no meio da cópia, o SQLite
+    reinicia os passos e o resultado é sempre um snapshot consistente.
+    Retorna o caminho do backup ou None em caso de erro.
+    """
+    origem = conectar_bd(db_file)
+    if origem is None:
+        return None
+    try:
+        copia = sqlite3.connect(destino)
+        try:
+            origem.backup(copia, pages=paginas_por_passo, sleep=pausa)
+        finally:
+            copia.close()
+        print(f"Backup salvo em '{destino}'.")
+        return destino
+    except sqlite3.Error as e:
+        print(f"Erro ao fazer backup: {e}")
+        return None
+    finally:
+        origem.close()
+
+def fazer_snapshot(diretorio, db_file=None, manter=7):
+    """Cria um backup com data e hora no nome e remove os mais antigos que `manter`."""
+    os.makedirs(diretorio, exist_ok=True)
+    nome = f"{PREFIXO_BACKUP}{datetime.now():%Y%m%d_%H%M%S}.db"
+    caminho = fazer_backup(os.path.join(diretorio, nome), db_file)
+    if caminho:
+        snapshots = sorted(f for f in os.listdir(diretorio) if f.startswith(PREFIXO_BACKUP) and f.endswith(".db"))
+        for antigo in snapshots[:-manter] if manter else []:
+            os.remove(os.path.join(diretorio, antigo))
+            print(f"Backup antigo '{antigo}' removido.")
+    return caminho
+
+def fazer_snapshot_em_segundo_plano(diretorio, db_file=None, manter=7):
+    """Executa fazer_snapshot em uma thread e retorna a thread iniciada."""
+    thread = threading.Thread(target=fazer_snapshot, args=(diretorio, db_file, manter),
+                              name="backup_agenda", daemon=True)
+    thread.start()
+    return thread
+
+#############################
+# COMPACTAÇÃO E OTIMIZAÇÃO #
+#############################
+
+def compactar_bd(conn, destino):
+    """Grava em `destino` uma cópia compactada do banco (VACUUM INTO).
+
+    O banco em uso não é bloqueado para leitura nem reescrito; a cópia pode
+    substituir o original em uma janela de manutenção.
+    """
+    if os.path.exists(destino):
+        print(f"Erro ao compactar: '{destino}' já existe.")
+        return None
+    try:
+        conn.execute("VACUUM INTO ?", (destino,))
+        print(f"Cópia compactada salva em '{destino}'.")
+        return destino
+    except sqlite3.Error as e:
+        print(f"Erro ao compactar banco de dados: {e}")
+        return None
+
+def habilitar_vacuum_incremental(conn):
+    """Muda o banco para auto_vacuum=INCREMENTAL (exige um VACUUM completo, uma única vez)."""
+    try:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        print("auto_vacuum INCREMENTAL habilitado.")
+        return True
+    except sqlite3.Error as e:
+        print(f"Erro ao habilitar vacuum incremental: {e}")
+        return False
+
+def vacuum_incremental(conn, paginas=None):
+    """Devolve ao sistema até `paginas` páginas livres (todas, se None).
+
+    Diferente do VACUUM completo, cada chamada é curta e pode ser agendada
+    com a aplicação em uso. Requer auto_vacuum=INCREMENTAL.
+    """
+    modo = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+    if modo != 2:
+        print("vacuum incremental indisponível: use habilitar_vacuum_incremental() primeiro.")
+        return False
+    # O pragma libera uma página por passo; executescript executa todos os
+    # passos (com execute() o sqlite3 do Python pararia no primeiro)
+    pragma = "PRAGMA incremental_vacuum" if paginas is None else f"PRAGMA incremental_vacuum({int(paginas)})"
+    try:
+        conn.executescript(pragma)
+        return True
+    except sqlite3.Error as e:
+        print(f"Erro no vacuum incremental: {e}")
+        return False
+
+def otimizar(conn, analyze=False):
+    """Atualiza as estatísticas usadas pelo planejador de consultas.
+
+    Por padrão usa PRAGMA optimize, que só analisa o que o SQLite considera
+    desatualizado; com analyze=True executa um ANALYZE completo.
+    """
+    try:
+        conn.execute("ANALYZE" if analyze else "PRAGMA optimize")
+        conn.commit()
+        print("Estatísticas do banco de dados atualizadas.")
+        return True
+    except sqlite3.Error as e:
+        print(f"Erro ao otimizar banco de dados: {e}")
+        return False
+
+def executar_manutencao(db_file=None, paginas=None):
+    """Vacuum incremental + otimização, com relatório antes e depois."""
+    conn = conectar_bd(db_file)
+    if conn is None:
+        return None
+    try:
+        antes = relatorio_arquivo(conn, db_file)
+        vacuum_incremental(conn, paginas)
+        otimizar(conn)
+        depois = relatorio_arquivo(conn, db_file)
+        comparar_relatorios(antes, depois)
+        return antes, depois
+    finally:
+        conn.close()
+
+#############################
+# AGENDAMENTO #
+#############################
+
+class AgendadorManutencao:
+    """Executa snapshots e manutenção periodicamente em threads de segundo plano.
+
+    Cada tarefa abre sua própria conexão, então pode rodar junto com a aplicação.
+    """
+
+    def __init__(self, diretorio_backup, db_file=None, intervalo_backup=6 * 3600,
+                 intervalo_otimizacao=24 * 3600, manter=7):
+        self.diretorio_backup = diretorio_backup
+        self.db_file = db_file
+        self.manter = manter
+        self.tarefas = [
+            (intervalo_backup, lambda: fazer_snapshot(self.diretorio_backup, self.db_file, self.manter)),
+            (intervalo_otimizacao, lambda: executar_manutencao(self.db_file)),
+        ]
+        self.parada = threading.Event()
+        self.threads = []
+
+    def iniciar(self):
+        for intervalo, tarefa in self.tarefas:
+            thread = threading.Thread(target=self._repetir, args=(intervalo, tarefa), daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def parar(self):
+        self.parada.set()
+        for thread in self.threads:
+            thread.join()
+
+    def _repetir(self, intervalo, tarefa):
+        # Event.wait retorna True quando parar() é chamado, encerrando o laço
+        while not self.parada.wait(intervalo):
+            try:
+                tarefa()
+            except Exception as e: # Uma falha não deve interromper as próximas execuções
+                print(f"Erro na manutenção agendada: {e}")
+
+#############################
+# LINHA DE COMANDO #
+#############################
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manutenção do banco de dados da Agenda Médica.")
+    parser.add_argument("--bd", default=None, help=f"arquivo do banco (padrão: {DB_FILE})")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    comandos.add_parser("relatorio", help="tamanho e fragmentação do arquivo")
+    backup = comandos.add_parser("backup", help="snapshot online em um diretório")
+    backup.add_argument("diretorio")
+    backup.add_argument("--manter", type=int, default=7)
+    compactar = comandos.add_parser("compactar", help="cópia compactada com VACUUM INTO")
+    compactar.add_argument("destino")
+    vacuum = comandos.add_parser("vacuum", help="vacuum incremental e otimização")
+    vacuum.add_argument("--paginas", type=int, default=None)
+    vacuum.add_argument("--habilitar", action="store_true", help="muda o banco para auto_vacuum=INCREMENTAL")
+    otimizar_cmd = comandos.add_parser("otimizar", help="PRAGMA optimize ou ANALYZE")
+    otimizar_cmd.add_argument("--analyze", action="store_true")
+    agendar = comandos.add_parser("agendar", help="executa backups e manutenção periodicamente")
+    agendar.add_argument("diretorio")
+    agendar.add_argument("--intervalo-backup", type=float, default=6, help="horas")
+    agendar.add_argument("--intervalo-otimizacao", type=float, default=24, help="horas")
+    agendar.add_argument("--manter", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    if args.comando == "backup":
+        return 0 if fazer_snapshot(args.diretorio, args.bd, args.manter) else 1
+    if args.comando == "agendar":
+        agendador = AgendadorManutencao(args.diretorio, args.bd, args.intervalo_backup * 3600,
+                                        args.intervalo_otimizacao * 3600, args.manter)
+        agendador.iniciar()
+        print("Manutenção agendada. Pressione Ctrl+C para encerrar.")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            agendador.parar()
+        return 0
+    if args.comando == "vacuum" and not args.habilitar:
+        return 0 if executar_manutencao(args.bd, args.paginas) else 1
+
+    conn = conectar_bd(args.bd)
+    if conn is None:
+        return 1
+    try:
+        if args.comando == "relatorio":
+            imprimir_relatorio(relatorio_arquivo(conn, args.bd))
+        elif args.comando == "compactar":
+            antes = relatorio_arquivo(conn, args.bd)
+            if not compactar_bd(conn, args.destino):
+                return 1
+            print(f"Tamanho: {antes['tamanho_arquivo'] / 1024:.1f} KiB -> {os.path.getsize(args.destino) / 1024:.1f} KiB")
+        elif args.comando == "vacuum":
+            antes = relatorio_arquivo(conn, args.bd)
+            if not habilitar_vacuum_incremental(conn):
+                return 1
+            comparar_relatorios(antes, relatorio_arquivo(conn, args.bd))
+        elif args.comando == "otimizar":
+            return 0 if otimizar(conn, args.analyze) else 1
+        return 0
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    raise SystemExit(main())
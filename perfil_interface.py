@@ -0,0 +1,170 @@
+"""Modo de perfil da interface da Agenda Médica.
+
+Ativado com `python agenda_medica_unificada.py --perfil [ARQUIVO.json]`. Mede:
+- a responsividade do mainloop: um "batimento" é agendado com after() a cada
+  INTERVALO_BATIMENTO ms, e o atraso em relação ao horário previsto é o tempo
+  em que o loop ficou ocupado (atrasos acima de LIMITE_QUADRO_LONGO viram
+  "quadros longos");
+- cada comando de botão e de menu e cada handler de <<TreeviewSelect>>;
+- dentro deles, as funções de banco (listar_*, adicionar_*...), os carregar_*
+  das telas (consulta + inserção na Treeview) e as caixas do messagebox.
+Os tempos aparecem em uma barra no rodapé da janela e, ao fechar, são gravados
+no formato Chrome trace (abra em chrome://tracing ou https://ui.perfetto.dev).
+"""
+import functools
+import json
+import os
+import threading
+import time
+import tkinter as tk
+from tkinter import ttk, messagebox
+
+# Constantes
+ARQUIVO_TRACE = "agenda_perfil.json"
+INTERVALO_BATIMENTO = 50 # ms entre os batimentos do monitor de atraso
+LIMITE_QUADRO_LONGO = 100 # ms de atraso a partir dos quais o loop é considerado travado
+MAXIMO_EVENTOS = 200000 # Eventos guardados para o trace (os seguintes são descartados)
+PREFIXOS_SQL = ("listar_", "adicionar_", "atualizar_", "deletar_", "obter_", "buscar_", "consultar_")
+FUNCOES_MESSAGEBOX = ("showinfo", "showwarning", "showerror", "askyesno", "askyesnocancel", "askokcancel")
+CATEGORIAS_INTERACAO = ("botao", "menu", "selecao") # Exibidas como "último" na barra
+
+class PerfilInterface:
+    """Coleta os tempos da interface e os grava em formato Chrome trace."""
+
+    def __init__(self, app, arquivo=ARQUIVO_TRACE, intervalo=INTERVALO_BATIMENTO, limite=LIMITE_QUADRO_LONGO):
+        self.app = app
+        self.arquivo = arquivo
+        self.intervalo = intervalo
+        self.limite = limite
+        self.inicio = time.perf_counter()
+        self.pid = os.getpid()
+        self.tid = threading.get_ident()
+        self.eventos = []
+        self.maior_atraso = 0.0
+        self.quadros_longos = 0
+        self.ultima_interacao = ""
+        self.inicios_selecao = {} # Treeview -> instante em que o <<TreeviewSelect>> começou
+
+        self.barra = ttk.Label(app, text="Perfil ativo", anchor="w")
+        self.barra.pack(side=tk.BOTTOM, fill=tk.X, padx=10)
+
+        # As Treeviews instrumentadas recebem estas tags antes e depois das
+        # próprias, então os dois handlers cercam todos os outros
+        app.bind_class("PerfilInicio", "<<TreeviewSelect>>", self._inicio_selecao)
+        app.bind_class("PerfilFim", "<<TreeviewSelect>>", self._fim_selecao)
+        app.after(self.intervalo, self._batimento, time.perf_counter() + self.intervalo / 1000)
+
+    # --- Registro ---
+
+    def _microssegundos(self, instante):
+        return round((instante - self.inicio) * 1e6)
+
+    def registrar(self, nome, categoria, inicio, fim):
+        """Registra um intervalo (evento "X" do Chrome trace)."""
+        if len(self.eventos) < MAXIMO_EVENTOS:
+            self.eventos.append({"name": nome, "cat": categoria, "ph": "X", "pid": self.pid, "tid": self.tid,
+                                 "ts": self._microssegundos(inicio), "dur": round((fim - inicio) * 1e6)})
+        if categoria in CATEGORIAS_INTERACAO:
+            self.ultima_interacao = f"{nome} {(fim - inicio) * 1000:.0f} ms"
+
+    def medir(self, funcao, nome, categoria):
+        """Retorna `funcao` envolvida por um registro de tempo."""
+        @functools.wraps(funcao)
+        def medida(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                self.registrar(nome, categoria, inicio, time.perf_counter())
+        medida.perfil_original = funcao
+        return medida
+
+    # --- Monitor do mainloop ---
+
+    def _batimento(self, previsto):
+        agora = time.perf_counter()
+        atraso = max(0.0, (agora - previsto) * 1000)
+        self.maior_atraso = max(self.maior_atraso, atraso)
+        if len(self.eventos) < MAXIMO_EVENTOS:
+            self.eventos.append({"name": "atraso do loop (ms)", "ph": "C", "pid": self.pid, "tid": self.tid,
+                                 "ts": self._microssegundos(agora), "args": {"atraso": round(atraso, 1)}})
+        if atraso > self.limite:
+            self.quadros_longos += 1
+            self.registrar("quadro longo", "loop", previsto, agora)
+        self.barra.config(text=f"Perfil: atraso {atraso:.0f} ms (máx. {self.maior_atraso:.0f}) | "
+                               f"quadros longos: {self.quadros_longos} | último: {self.ultima_interacao}")
+        self.app.after(self.intervalo, self._batimento, agora + self.intervalo / 1000)
+
+    # --- Instrumentação ---
+
+    def instrumentar_modulo(self, modulo):
+        """Mede as funções de banco do módulo, os carregar_* das telas e o messagebox.
+
+        As telas chamam essas funções pelo nome global, então substituí-las no
+        módulo basta para que as chamadas passem pela medição.
+        """
+        for nome in dir(modulo):
+            objeto = getattr(modulo, nome)
+            if nome.startswith(PREFIXOS_SQL) and callable(objeto) and not isinstance(objeto, type):
+                self._substituir(modulo, nome, "sql")
+            elif isinstance(objeto, type) and issubclass(objeto, modulo.TelaCacheavel):
+                for metodo in vars(objeto):
+                    if metodo.startswith("carregar_"):
+                        self._substituir(objeto, metodo, "treeview", f"{nome}.{metodo}")
+        for nome in FUNCOES_MESSAGEBOX:
+            self._substituir(messagebox, nome, "messagebox", f"messagebox.{nome}")
+
+    def _substituir(self, alvo, nome, categoria, rotulo=None):
+        original = getattr(alvo, nome)
+        if not hasattr(original, "perfil_original"): # Não mede duas vezes
+            setattr(alvo, nome, self.medir(original, rotulo or nome, categoria))
+
+    def instrumentar(self, widget):
+        """Mede os botões, itens de menu e Treeviews de `widget` e de seus descendentes."""
+        pendentes = [widget]
+        while pendentes:
+            atual = pendentes.pop()
+            pendentes.extend(atual.winfo_children())
+            if getattr(atual, "perfil_instrumentado", False):
+                continue
+            atual.perfil_instrumentado = True
+            classe = atual.winfo_class()
+            if classe in ("TButton", "Button"):
+                comando = str(atual.cget("command"))
+                if comando:
+                    atual.configure(command=self._comando_medido(atual, comando, f"botão {atual.cget('text')}", "botao"))
+            elif classe == "Menu":
+                ultimo = atual.index("end")
+                for indice in range(0 if ultimo is None else ultimo + 1):
+                    if atual.type(indice) == "command":
+                        comando = str(atual.entrycget(indice, "command"))
+                        if comando:
+                            rotulo = f"menu {atual.entrycget(indice, 'label')}"
+                            atual.entryconfigure(indice, command=self._comando_medido(atual, comando, rotulo, "menu"))
+            elif classe == "Treeview":
+                atual.bindtags(("PerfilInicio",) + atual.bindtags() + ("PerfilFim",))
+
+    def _comando_medido(self, widget, comando, rotulo, categoria):
+        # O comando original já está registrado no Tcl: é chamado pelo nome
+        return self.medir(lambda: widget.tk.call(comando), rotulo, categoria)
+
+    def _inicio_selecao(self, event):
+        self.inicios_selecao[event.widget] = time.perf_counter()
+
+    def _fim_selecao(self, event):
+        inicio = self.inicios_selecao.pop(event.widget, None)
+        if inicio is not None:
+            self.registrar(f"seleção {event.widget.winfo_name()}", "selecao", inicio, time.perf_counter())
+
+    # --- Resultado ---
+
+    def salvar(self):
+        """Grava o trace e imprime as interações mais lentas."""
+        with open(self.arquivo, "w", encoding="utf-8") as arquivo:
+            json.dump({"traceEvents": self.eventos, "displayTimeUnit": "ms"}, arquivo, ensure_ascii=False)
+        print(f"Trace de perfil gravado em '{self.arquivo}' ({len(self.eventos)} eventos).")
+        print(f"Maior atraso do loop: {self.maior_atraso:.0f} ms; quadros longos (> {self.limite} ms): {self.quadros_longos}")
+        lentos = sorted((evento for evento in self.eventos if evento.get("cat") in CATEGORIAS_INTERACAO),
+                        key=lambda evento: evento["dur"], reverse=True)[:5]
+        for evento in lentos:
+            print(f"  {evento['name']:<40} {evento['dur'] / 1000:8.1f} ms")
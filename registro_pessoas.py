@@ -0,0 +1,291 @@
+"""Armazenamento indexado das pessoas cadastradas pelo ui_one.py.
+
+Cada registro é uma linha JSON em ARQUIVO_DADOS. O ARQUIVO_INDICE guarda, para
+cada registro gravado, o nome e a posição (em bytes) da linha; ao abrir, o
+índice é lido para um dicionário e a busca por nome é um único seek + readline.
+Gravar um nome já existente acrescenta uma nova versão do registro; as versões
+antigas são descartadas pela compactação.
+
+Uso:
+    python registro_pessoas.py migrar [pessoa.txt]
+    python registro_pessoas.py buscar NOME
+    python registro_pessoas.py compactar
+"""
+import json
+import locale
+import os
+import sys
+
+# Constantes
+ARQUIVO_DADOS = "pessoas.jsonl"
+ARQUIVO_INDICE = "pessoas.idx"
+ARQUIVO_LEGADO = "pessoa.txt"
+POLITICAS_SYNC = ("sempre", "lote", "nunca")
+
+class RegistroPessoas:
+    """Log de registros JSON com índice em disco por nome.
+
+    sync define quando os dados vão para o disco:
+    - "sempre": flush + fsync a cada gravação;
+    - "lote": flush + fsync a cada `tamanho_lote` gravações e ao fechar;
+    - "nunca": apenas o buffer do Python, gravado ao fechar (ou quando enche).
+    A compactação é feita automaticamente quando a fração de registros
+    obsoletos passa de `limite_compactacao`.
+    """
+
+    def __init__(self, arquivo_dados=ARQUIVO_DADOS, arquivo_indice=ARQUIVO_INDICE,
+                 sync="lote", tamanho_lote=32, limite_compactacao=0.5, minimo_compactacao=1000):
+        if sync not in POLITICAS_SYNC:
+            raise ValueError(f"Política de sync inválida: {sync}. Use uma de {POLITICAS_SYNC}.")
+        self.arquivo_dados = arquivo_dados
+        self.arquivo_indice = arquivo_indice
+        self.sync = sync
+        self.tamanho_lote = tamanho_lote
+        self.limite_compactacao = limite_compactacao
+        self.minimo_compactacao = minimo_compactacao
+        self.indice = {} # nome -> posição da linha mais recente em arquivo_dados
+        self.total_registros = 0 # Linhas em arquivo_dados, incluindo versões antigas
+        self.pendentes = 0 # Gravações ainda não sincronizadas com o disco
+        self._carregar_indice()
+        self._dados = open(self.arquivo_dados, "ab")
+        self._arquivo_indice = open(self.arquivo_indice, "ab")
+        self._leitura = open(self.arquivo_dados, "rb")
+
+    # --- Abertura e recuperação ---
+
+    def _carregar_indice(self):
+        """Lê o índice e indexa os registros gravados depois dele (ex.: após uma queda)."""
+        fim_indexado = 0
+        if os.path.exists(self.arquivo_indice):
+            with open(self.arquivo_indice, "rb") as arquivo:
+                for linha in arquivo:
+                    try:
+                        nome, posicao, tamanho, removido = json.loads(linha)
+                    except ValueError: # Linha incompleta no fim do índice
+                        break
+                    self._aplicar({"nome": nome, "removido": removido}, posicao)
+                    self.total_registros += 1
+                    fim_indexado = max(fim_indexado, posicao + tamanho)
+        if not os.path.exists(self.arquivo_dados):
+            open(self.arquivo_dados, "wb").close()
+        if fim_indexado > os.path.getsize(self.arquivo_dados):
+            # Índice à frente dos dados (sync="nunca" após uma queda): reconstrói tudo
+            self.indice = {}
+            self.total_registros = 0
+            fim_indexado = 0
+        # Reescreve o índice se havia registros sem entrada (ou uma linha incompleta)
+        if self._indexar_a_partir_de(fim_indexado) or fim_indexado == 0:
+            self._reescrever_indice()
+
+    def _indexar_a_partir_de(self, posicao):
+        """Indexa as linhas de arquivo_dados a partir de `posicao`. Retorna quantas foram lidas."""
+        lidas = 0
+        with open(self.arquivo_dados, "rb+") as arquivo:
+            arquivo.seek(posicao)
+            for linha in iter(arquivo.readline, b""):
+                try:
+                    if not linha.endswith(b"\n"):
+                        raise ValueError("linha incompleta")
+                    registro = json.loads(linha)
+                except ValueError:
+                    # Gravação interrompida: descarta o resto do arquivo
+                    arquivo.truncate(posicao)
+                    break
+                self._aplicar(registro, posicao)
+                self.total_registros += 1
+                posicao += len(linha)
+                lidas += 1
+        return lidas
+
+    def _aplicar(self, registro, posicao):
+        if registro.get("removido"):
+            self.indice.pop(registro["nome"], None)
+        else:
+            self.indice[registro["nome"]] = posicao
+
+    def _reescrever_indice(self):
+        """Grava o índice completo a partir de arquivo_dados (usado na recuperação)."""
+        temporario = self.arquivo_indice + ".tmp"
+        with open(self.arquivo_dados, "rb") as dados, open(temporario, "wb") as indice:
+            posicao = 0
+            for linha in dados:
+                indice.write(self._linha_indice(json.loads(linha), posicao, len(linha)))
+                posicao += len(linha)
+            indice.flush()
+            os.fsync(indice.fileno())
+        os.replace(temporario, self.arquivo_indice)
+
+    @staticmethod
+    def _linha_indice(registro, posicao, tamanho):
+        entrada = [registro["nome"], posicao, tamanho, bool(registro.get("removido"))]
+        return (json.dumps(entrada, ensure_ascii=False) + "\n").encode("utf-8")
+
+    # --- Gravação ---
+
+    def _gravar(self, registro):
+        linha = (json.dumps(registro, ensure_ascii=False) + "\n").encode("utf-8")
+        posicao = self._dados.tell()
+        self._dados.write(linha)
+        self._arquivo_indice.write(self._linha_indice(registro, posicao, len(linha)))
+        self._aplicar(registro, posicao)
+        self.total_registros += 1
+        self.pendentes += 1
+        if self.sync == "sempre" or (self.sync == "lote" and self.pendentes >= self.tamanho_lote):
+            self.sincronizar()
+        if (self.total_registros >= self.minimo_compactacao
+                and 1 - len(self.indice) / self.total_registros > self.limite_compactacao):
+            self.compactar()
+
+    def salvar(self, nome, endereco):
+        """Grava (ou substitui) a pessoa `nome`. Retorna True se ela já existia."""
+        existia = nome in self.indice
+        self._gravar({"nome": nome, "endereco": endereco})
+        return existia
+
+    def remover(self, nome):
+        """Remove a pessoa `nome`. Retorna False se ela não existia."""
+        if nome not in self.indice:
+            return False
+        self._gravar({"nome": nome, "removido": True})
+        return True
+
+    def sincronizar(self, fsync=True):
+        """Grava os buffers no arquivo e, com fsync, garante que chegaram ao disco."""
+        for arquivo in (self._dados, self._arquivo_indice):
+            arquivo.flush()
+            if fsync:
+                os.fsync(arquivo.fileno())
+        self.pendentes = 0
+
+    # --- Leitura ---
+
+    def buscar(self, nome):
+        """Retorna o registro de `nome` (dicionário) ou None."""
+        posicao = self.indice.get(nome)
+        if posicao is None:
+            return None
+        if self.pendentes:
+            self._dados.flush() # O registro pode estar só no buffer de gravação
+        self._leitura.seek(posicao)
+        return json.loads(self._leitura.readline())
+
+    def __contains__(self, nome):
+        return nome in self.indice
+
+    def __len__(self):
+        return len(self.indice)
+
+    def nomes(self):
+        return list(self.indice)
+
+    # --- Manutenção ---
+
+    def compactar(self):
+        """Reescreve os arquivos mantendo apenas a versão atual de cada pessoa."""
+        self.sincronizar(fsync=False)
+        temporario_dados = self.arquivo_dados + ".tmp"
+        temporario_indice = self.arquivo_indice + ".tmp"
+        novo_indice = {}
+        with open(temporario_dados, "wb") as dados, open(temporario_indice, "wb") as indice:
+            for nome, posicao in self.indice.items():
+                self._leitura.seek(posicao)
+                linha = self._leitura.readline()
+                novo_indice[nome] = dados.tell()
+                dados.write(linha)
+                indice.write(self._linha_indice({"nome": nome}, novo_indice[nome], len(linha)))
+            for arquivo in (dados, indice):
+                arquivo.flush()
+                os.fsync(arquivo.fileno())
+        self._fechar_arquivos()
+        # O índice antigo é apagado antes da troca: se o processo cair entre as
+        # duas trocas, o índice é reconstruído a partir dos dados ao abrir
+        os.remove(self.arquivo_indice)
+        os.replace(temporario_dados, self.arquivo_dados)
+        os.replace(temporario_indice, self.arquivo_indice)
+        self.indice = novo_indice
+        self.total_registros = len(novo_indice)
+        self._dados = open(self.arquivo_dados, "ab")
+        self._arquivo_indice = open(self.arquivo_indice, "ab")
+        self._leitura = open(self.arquivo_dados, "rb")
+
+    def _fechar_arquivos(self):
+        for arquivo in (self._dados, self._arquivo_indice, self._leitura):
+            arquivo.close()
+
+    def fechar(self):
+        self.sincronizar(fsync=self.sync != "nunca")
+        self._fechar_arquivos()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+def _ler_legado(caminho):
+    """Texto do pessoa.txt: UTF-8 ou, se não decodificar, a codificação do sistema (cp1252 no Windows).
+
+    O ui_one.py antigo gravava o arquivo com a codificação padrão do open().
+    """
+    with open(caminho, "rb") as arquivo:
+        dados = arquivo.read()
+    try:
+        return dados.decode("utf-8")
+    except UnicodeDecodeError:
+        pass
+    for codificacao in (locale.getpreferredencoding(False), "cp1252"):
+        try:
+            return dados.decode(codificacao)
+        except (UnicodeDecodeError, LookupError):
+            continue
+    return None
+
+def migrar_pessoa_txt(registro, caminho=ARQUIVO_LEGADO):
+    """Importa o pessoa.txt antigo ("Nome: ..." / "Endereço: ...") para o registro.
+
+    O arquivo inteiro é lido antes de gravar qualquer pessoa: se ele não
+    decodificar ou algum registro não estiver no formato, nada é importado e o
+    arquivo fica onde está. Ao final, é renomeado para <caminho>.migrado, para
+    não ser importado de novo. Retorna o número de pessoas importadas ou None.
+    """
+    texto = _ler_legado(caminho)
+    if texto is None:
+        print(f"Erro ao migrar '{caminho}': codificação desconhecida. O arquivo não foi alterado.")
+        return None
+    pessoas = []
+    nome = None
+    for numero, linha in enumerate(texto.splitlines(), start=1):
+        if not linha.strip():
+            continue
+        if linha.startswith("Nome: ") and nome is None:
+            nome = linha[len("Nome: "):]
+        elif linha.startswith("Endereço: ") and nome is not None:
+            pessoas.append((nome, linha[len("Endereço: "):]))
+            nome = None
+        else:
+            print(f"Erro ao migrar '{caminho}': linha {numero} fora do formato ({linha[:40]!r}). "
+                  "Nenhuma pessoa foi importada e o arquivo não foi alterado.")
+            return None
+    if nome is not None:
+        print(f"Erro ao migrar '{caminho}': o último registro ('{nome}') não tem endereço. "
+              "Nenhuma pessoa foi importada e o arquivo não foi alterado.")
+        return None
+    for nome, endereco in pessoas:
+        registro.salvar(nome, endereco)
+    registro.sincronizar()
+    os.replace(caminho, caminho + ".migrado")
+    print(f"{len(pessoas)} pessoas importadas de '{caminho}'.")
+    return len(pessoas)
+
+if __name__ == "__main__":
+    comando = sys.argv[1] if len(sys.argv) > 1 else ""
+    with RegistroPessoas() as registro:
+        if comando == "migrar":
+            migrar_pessoa_txt(registro, sys.argv[2] if len(sys.argv) > 2 else ARQUIVO_LEGADO)
+        elif comando == "buscar" and len(sys.argv) > 2:
+            print(registro.buscar(sys.argv[2]) or "Pessoa não encontrada.")
+        elif comando == "compactar":
+            registro.compactar()
+            print(f"Registro compactado: {len(registro)} pessoas.")
+        else:
+            print(__doc__)
@@ -1,15 +1,24 @@
+import os
 import tkinter as tk 
+from registro_pessoas import ARQUIVO_LEGADO, RegistroPessoas, migrar_pessoa_txt
+
+registro = RegistroPessoas()
+if os.path.exists(ARQUIVO_LEGADO):
+    migrar_pessoa_txt(registro)
 
 def salvar_pessoa():
     nome = entry_nome.get()
     endereco = entry_endereco.get()
     if nome:
-        with open("pessoa.txt","a") as arquivo:
-            arquivo.write("Nome: "+ nome +"\nEndereço: " + endereco +"\n")
-        label_status.config(text=f'Pessoa "{nome}" salva em endereço "{endereco}" com sucesso!', fg="green")
+        acao = "atualizada" if registro.salvar(nome, endereco) else "salva"
+        label_status.config(text=f'Pessoa "{nome}" {acao} em endereço "{endereco}" com sucesso!', fg="green")
     else:
         label_status.config(text = "Digite um nome.", fg="red")
 
+def fechar():
+    registro.fechar()
+    root.destroy()
+
 root = tk.Tk()
 root.title("Pessoa")
 root.geometry("350x300")
@@ -31,4 +40,5 @@ botao_salvar.pack(pady=10)
 
 label_status = tk.Label(root, text="")
 label_status.pack(pady=5)
+root.protocol("WM_DELETE_WINDOW", fechar)
 root.mainloop()
@@ -0,0 +1,300 @@
+"""Verificação de integridade do banco de dados da Agenda Médica.
+
+data_hora é texto livre e as chaves estrangeiras só valem nas conexões que
+ligam PRAGMA foreign_keys (conectar_bd), então bancos antigos ou editados por
+outras ferramentas acumulam linhas inválidas. Esta ferramenta procura:
+- consulta: data_hora fora do formato YYYY-MM-DD HH:MM, médico ou paciente
+  inexistente (órfã) e o mesmo horário do mesmo médico repetido;
+- medico: nome vazio e espaços sobrando no nome ou na especialidade;
+- paciente: nome vazio, data de nascimento inválida e telefone_normalizado /
+  nome_fonetico desatualizados.
+
+As tabelas são divididas em faixas de rowid, verificadas em paralelo por um
+pool de processos, cada um com a sua conexão somente leitura. Com --reparar,
+as correções são aplicadas em transações de TAMANHO_LOTE violações:
+- órfãs e repetições do mesmo paciente no mesmo horário são removidas (a
+  mais antiga fica);
+- datas em formatos conhecidos (FORMATOS_DATA_HORA) são reescritas; se a data
+  corrigida repetir uma consulta do mesmo médico e paciente, a linha é removida;
+- espaços, telefone_normalizado e nome_fonetico são recalculados.
+Horários de um médico com pacientes diferentes, datas irreconhecíveis, datas
+cuja correção cairia no horário de outro paciente do mesmo médico e nomes
+vazios só são relatados: precisam de alguém para decidir. A colisão da data
+corrigida é verificada de novo na hora do reparo, já que outra linha do lote
+pode ter sido corrigida para o mesmo horário.
+
+Uso:
+    python verificacao_integridade.py [--bd ARQUIVO] [--processos N] [--reparar] [--exemplos 5]
+"""
+import argparse
+import sqlite3
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from agenda_medica_unificada import (DB_FILE, caches_consultas, chave_fonetica, conectar_bd, marcar_alterado,
+                                     normalizar_telefone, uri_somente_leitura)
+
+# Constantes
+TABELAS = ("consulta", "medico", "paciente")
+TAMANHO_FAIXA = 250000 # Rowids por tarefa do pool
+TAMANHO_LOTE = 10000 # Reparos por transação
+FORMATO_DATA_HORA = "%Y-%m-%d %H:%M"
+FORMATOS_DATA_HORA = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M", "%Y-%m-%dT%H:%M:%S", "%d/%m/%Y %H:%M",
+                      "%d/%m/%Y %H:%M:%S", "%Y/%m/%d %H:%M", "%Y-%m-%d %Hh%M", "%Y-%m-%d")
+FORMATOS_DATA = ("%d/%m/%Y", "%Y/%m/%d", "%d-%m-%Y", "%Y-%m-%d %H:%M", "%Y-%m-%d %H:%M:%S")
+
+# reparo: "remover", "atualizar" (coluna = correcao) ou None (só relatar)
+Violacao = namedtuple("Violacao", ("tabela", "id", "tipo", "coluna", "valor", "reparo", "correcao"))
+
+#############################
+# VERIFICAÇÃO #
+#############################
+
+def corrigir_data(valor, formatos=FORMATOS_DATA_HORA, formato=FORMATO_DATA_HORA):
+    """Reescreve `valor` no `formato` se ele estiver em um dos `formatos` conhecidos; senão, None."""
+    if not isinstance(valor, str):
+        return None
+    valor = " ".join(valor.split())
+    for formato_entrada in (formato,) + formatos:
+        try:
+            return datetime.strptime(valor, formato_entrada).strftime(formato)
+        except ValueError:
+            continue
+    return None
+
+# Consulta do mesmo médico no horário: 1 se houver uma do mesmo paciente, 0 se só de outros, NULL se livre
+SQL_COLISAO_HORARIO = """
+    SELECT MAX(id_paciente = ?) FROM consulta WHERE id_medico = ? AND data_hora = ? AND id_consulta != ?
+    """
+
+# Uma passada pela faixa: o WHERE descarta as linhas válidas e as colunas de
+# diagnóstico só são calculadas para as suspeitas. O índice (id_medico,
+# data_hora) resolve a busca de horário repetido; só a consulta mais antiga de
+# cada horário fica de fora.
+SQL_CONSULTAS_SUSPEITAS = """
+    SELECT c.id_consulta, c.id_medico, c.id_paciente, c.data_hora,
+           strftime('%Y-%m-%d %H:%M', c.data_hora) IS NOT c.data_hora,
+           NOT EXISTS (SELECT 1 FROM medico m WHERE m.id_medico = c.id_medico),
+           NOT EXISTS (SELECT 1 FROM paciente p WHERE p.id_paciente = c.id_paciente),
+           (SELECT MAX(d.id_paciente = c.id_paciente) FROM consulta d
+            WHERE d.id_medico = c.id_medico AND d.data_hora = c.data_hora AND d.id_consulta < c.id_consulta)
+    FROM consulta c
+    WHERE c.rowid BETWEEN ? AND ?
+      AND (strftime('%Y-%m-%d %H:%M', c.data_hora) IS NOT c.data_hora
+           OR NOT EXISTS (SELECT 1 FROM medico m WHERE m.id_medico = c.id_medico)
+           OR NOT EXISTS (SELECT 1 FROM paciente p WHERE p.id_paciente = c.id_paciente)
+           OR EXISTS (SELECT 1 FROM consulta d WHERE d.id_medico = c.id_medico AND d.data_hora = c.data_hora
+                      AND d.id_consulta < c.id_consulta))
+    """
+
+def _verificar_consultas(conn, inicio, fim):
+    violacoes = []
+    for (id_consulta, id_medico, id_paciente, data_hora,
+         data_invalida, medico_orfao, paciente_orfao, repetido) in conn.execute(SQL_CONSULTAS_SUSPEITAS, (inicio, fim)):
+        if data_invalida:
+            correcao = corrigir_data(data_hora)
+            reparo = "atualizar" if correcao else None
+            if correcao:
+                colisao = conn.execute(SQL_COLISAO_HORARIO, (id_paciente, id_medico, correcao, id_consulta)).fetchone()[0]
+                if colisao is not None: # Repete a consulta do paciente / tomaria o horário de outro
+                    reparo = "remover" if colisao else None
+            violacoes.append(Violacao("consulta", id_consulta, "data_invalida", "data_hora", data_hora, reparo, correcao))
+        if medico_orfao:
+            violacoes.append(Violacao("consulta", id_consulta, "medico_orfao", "id_medico", id_medico, "remover", None))
+        if paciente_orfao:
+            violacoes.append(Violacao("consulta", id_consulta, "paciente_orfao", "id_paciente", id_paciente, "remover", None))
+        if repetido == 1: # Outra consulta do mesmo paciente no mesmo horário
+            violacoes.append(Violacao("consulta", id_consulta, "horario_duplicado", "data_hora", data_hora, "remover", None))
+        elif repetido == 0:
+            violacoes.append(Violacao("consulta", id_consulta, "conflito_horario", "data_hora", data_hora, None, None))
+    return violacoes
+
+def _verificar_medicos(conn, inicio, fim):
+    violacoes = []
+    for id_medico, nome, especialidade in conn.execute(
+            "SELECT id_medico, nome, especialidade FROM medico WHERE rowid BETWEEN ? AND ?", (inicio, fim)):
+        if not isinstance(nome, str) or not nome.strip():
+            violacoes.append(Violacao("medico", id_medico, "nome_vazio", "nome", nome, None, None))
+        elif nome != nome.strip():
+            violacoes.append(Violacao("medico", id_medico, "espacos", "nome", nome, "atualizar", nome.strip()))
+        if isinstance(especialidade, str) and especialidade != especialidade.strip():
+            violacoes.append(Violacao("medico", id_medico, "espacos", "especialidade", especialidade,
+                                      "atualizar", especialidade.strip()))
+    return violacoes
+
+def _verificar_pacientes(conn, inicio, fim):
+    violacoes = []
+    for id_paciente, nome, data_nascimento, telefone, telefone_normalizado, nome_fonetico in conn.execute(
+            "SELECT id_paciente, nome, data_nascimento, telefone, telefone_normalizado, nome_fonetico "
+            "FROM paciente WHERE rowid BETWEEN ? AND ?", (inicio, fim)):
+        if not isinstance(nome, str) or not nome.strip():
+            violacoes.append(Violacao("paciente", id_paciente, "nome_vazio", "nome", nome, None, None))
+        elif nome_fonetico != chave_fonetica(nome):
+            violacoes.append(Violacao("paciente", id_paciente, "chave_desatualizada", "nome_fonetico",
+                                      nome_fonetico, "atualizar", chave_fonetica(nome)))
+        if data_nascimento and corrigir_data(data_nascimento, (), "%Y-%m-%d") != data_nascimento:
+            correcao = corrigir_data(data_nascimento, FORMATOS_DATA, "%Y-%m-%d")
+            violacoes.append(Violacao("paciente", id_paciente, "data_invalida", "data_nascimento", data_nascimento,
+                                      "atualizar" if correcao else None, correcao))
+        if telefone_normalizado != normalizar_telefone(telefone):
+            violacoes.append(Violacao("paciente", id_paciente, "chave_desatualizada", "telefone_normalizado",
+                                      telefone_normalizado, "atualizar", normalizar_telefone(telefone)))
+    return violacoes
+
+VERIFICADORES = {"consulta": _verificar_consultas, "medico": _verificar_medicos, "paciente": _verificar_pacientes}
+
+def verificar_faixa(caminho, tabela, inicio, fim):
+    """Verifica as linhas de `tabela` com inicio <= rowid <= fim, com uma conexão somente leitura própria."""
+    conn = sqlite3.connect(uri_somente_leitura(caminho), uri=True)
+    try:
+        return VERIFICADORES[tabela](conn, inicio, fim)
+    finally:
+        conn.close()
+
+def faixas_rowid(conn, tabela, tamanho_faixa=TAMANHO_FAIXA):
+    """Divide os rowids de `tabela` em faixas (inicio, fim) inclusivas."""
+    menor, maior = conn.execute(f"SELECT MIN(rowid), MAX(rowid) FROM {tabela}").fetchone()
+    if menor is None:
+        return []
+    return [(inicio, min(inicio + tamanho_faixa - 1, maior)) for inicio in range(menor, maior + 1, tamanho_faixa)]
+
+def verificar(db_file=None, processos=None, tamanho_faixa=TAMANHO_FAIXA, tabelas=TABELAS):
+    """Verifica as tabelas e retorna a lista de Violacao, em ordem de tabela e ID.
+
+    `processos` é o tamanho do pool (padrão: um por CPU); com 0, as faixas são
+    verificadas no próprio processo, uma após a outra.
+    """
+    caminho = db_file or DB_FILE
+    conn = sqlite3.connect(uri_somente_leitura(caminho), uri=True)
+    try:
+        tarefas = [(caminho, tabela, inicio, fim) for tabela in tabelas
+                   for inicio, fim in faixas_rowid(conn, tabela, tamanho_faixa)]
+    finally:
+        conn.close()
+    if processos == 0:
+        partes = [verificar_faixa(*tarefa) for tarefa in tarefas]
+    else:
+        with ProcessPoolExecutor(max_workers=processos) as executor:
+            partes = list(executor.map(verificar_faixa, *zip(*tarefas))) if tarefas else []
+    return sorted((violacao for parte in partes for violacao in parte), key=lambda v: (v.tabela, v.id, v.tipo, v.coluna))
+
+def imprimir_relatorio(violacoes, exemplos=5):
+    """Imprime a contagem de violações por tabela e tipo, com alguns exemplos de cada."""
+    if not violacoes:
+        print("Nenhuma violação encontrada.")
+        return
+    contagem = Counter((violacao.tabela, violacao.tipo) for violacao in violacoes)
+    reparaveis = Counter((violacao.tabela, violacao.tipo) for violacao in violacoes if violacao.reparo)
+    print(f"{len(violacoes)} violações encontradas:")
+    for (tabela, tipo), total in sorted(contagem.items()):
+        print(f"  {tabela}.{tipo}: {total} ({reparaveis[(tabela, tipo)]} reparáveis)")
+        for violacao in [v for v in violacoes if (v.tabela, v.tipo) == (tabela, tipo)][:exemplos]:
+            correcao = f" -> {violacao.correcao!r}" if violacao.correcao is not None else ""
+            if violacao.correcao is not None and violacao.reparo != "atualizar":
+                correcao += " (repete outra consulta)" if violacao.reparo else " (horário de outro paciente)"
+            print(f"    ID {violacao.id}: {violacao.coluna} = {violacao.valor!r}{correcao}")
+
+#############################
+# REPARO #
+#############################
+
+def _reparar_lote(cursor, lote, removidas):
+    removidos = atualizados = ignorados = 0
+    for violacao in lote:
+        chave = f"id_{violacao.tabela}"
+        if violacao.reparo == "remover":
+            if (violacao.tabela, violacao.id) not in removidas:
+                cursor.execute(f"DELETE FROM {violacao.tabela} WHERE {chave} = ?", (violacao.id,))
+                removidas.add((violacao.tabela, violacao.id))
+                removidos += cursor.rowcount
+        elif (violacao.tabela, violacao.id) in removidas:
+            continue
+        elif violacao.tabela == "consulta" and violacao.coluna == "data_hora":
+            # Outra linha do lote pode ter sido corrigida para o mesmo horário
+            # depois da verificação: a colisão é conferida de novo antes do UPDATE
+            linha = cursor.execute("SELECT id_medico, id_paciente FROM consulta WHERE id_consulta = ?",
+                                   (violacao.id,)).fetchone()
+            if linha is None:
+                continue
+            colisao = cursor.execute(SQL_COLISAO_HORARIO,
+                                     (linha[1], linha[0], violacao.correcao, violacao.id)).fetchone()[0]
+            if colisao is None:
+                cursor.execute("UPDATE consulta SET data_hora = ? WHERE id_consulta = ?", (violacao.correcao, violacao.id))
+                atualizados += cursor.rowcount
+            elif colisao: # Repete a consulta do mesmo paciente: a linha sobra
+                cursor.execute("DELETE FROM consulta WHERE id_consulta = ?", (violacao.id,))
+                removidas.add(("consulta", violacao.id))
+                removidos += cursor.rowcount
+            else: # Horário de outro paciente: fica para alguém decidir
+                print(f"Consulta ID {violacao.id} não reparada: {violacao.correcao} já está ocupado.")
+                ignorados += 1
+        else:
+            cursor.execute(f"UPDATE {violacao.tabela} SET {violacao.coluna} = ? WHERE {chave} = ?",
+                           (violacao.correcao, violacao.id))
+            atualizados += cursor.rowcount
+    return removidos, atualizados, ignorados
+
+def reparar(conn, violacoes, tamanho_lote=TAMANHO_LOTE):
+    """Aplica os reparos das violações, uma transação a cada `tamanho_lote`.
+
+    As remoções vêm antes das atualizações. Retorna (removidos, atualizados,
+    ignorados) ou None se uma transação falhar (os lotes anteriores ficam gravados).
+    """
+    pendentes = sorted((violacao for violacao in violacoes if violacao.reparo),
+                       key=lambda v: (v.reparo != "remover", v.tabela, v.id))
+    removidas = set()
+    totais = [0, 0, 0]
+    cursor = conn.cursor()
+    try:
+        for inicio in range(0, len(pendentes), tamanho_lote):
+            resultado = _reparar_lote(cursor, pendentes[inicio:inicio + tamanho_lote], removidas)
+            conn.commit()
+            totais = [total + parcial for total, parcial in zip(totais, resultado)]
+    except sqlite3.Error as e:
+        print(f"Erro ao reparar o banco de dados: {e}")
+        conn.rollback()
+        return None
+    finally:
+        cursor.close()
+        marcar_alterado(*TABELAS)
+        cache = caches_consultas.get(conn)
+        if cache:
+            cache.limpar()
+    print(f"Reparo concluído: {totais[0]} linhas removidas, {totais[1]} atualizadas, {totais[2]} ignoradas.")
+    return tuple(totais)
+
+#############################
+# LINHA DE COMANDO #
+#############################
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verifica (e repara) a integridade do banco da Agenda Médica.")
+    parser.add_argument("--bd", default=None, help=f"arquivo do banco (padrão: {DB_FILE})")
+    parser.add_argument("--processos", type=int, default=None, help="processos do pool (0: sem pool)")
+    parser.add_argument("--reparar", action="store_true", help="aplica os reparos possíveis")
+    parser.add_argument("--exemplos", type=int, default=5, help="exemplos mostrados por tipo de violação")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    try:
+        violacoes = verificar(args.bd, args.processos)
+    except sqlite3.Error as e:
+        print(f"Erro ao verificar o banco de dados: {e}")
+        return 1
+    print(f"Verificação concluída em {time.perf_counter() - inicio:.1f} s.")
+    imprimir_relatorio(violacoes, args.exemplos)
+    if args.reparar and violacoes:
+        conn = conectar_bd(args.bd)
+        if conn is None:
+            return 1
+        try:
+            if reparar(conn, violacoes) is None:
+                return 1
+        finally:
+            conn.close()
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())